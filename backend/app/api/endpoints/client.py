@@ -2,12 +2,13 @@
     Client endpoints for API service + debugging
 """
 
-from fastapi import APIRouter, Query
+import asyncio
+from fastapi import APIRouter, Depends, Query
 from typing import Dict, Any
 from app.models.models import *
 from app.api.endpoints import TimeFrame, HarkonnenException
-from app.nlp.sentiment import get_sentiment
-from app.nlp.rag.query_rag import RagStore
+from app.nlp.sentiment_batcher import SentimentBatcher, get_shared_batcher
+from app.nlp.rag.query_rag import RagStore, get_shared_store
 from app.nlp import ErrorCodes
 
 
@@ -16,15 +17,15 @@ sub_router = APIRouter(tags=["Client"])
 # ----- Sentiment -----
 
 @sub_router.get("/nlp/sentiment/single", response_model=Sentiment)
-def get_single_sentiment(content: str):
+async def get_single_sentiment(content: str, batcher: SentimentBatcher = Depends(get_shared_batcher)):
     """Run Finbert sentiment analysis on a single String"""
     try :
-         sent:Sentiment = get_sentiment(str)
+         sent:Sentiment = await asyncio.wrap_future(batcher.submit(content))
     except Exception as e:
             raise HarkonnenException(
                 500,
                 str(ErrorCodes.SENTIMENT_FAIL),
-                f"RAG FAILED",
+                f"SENTIMENT FAILED",
                 {"platform": "nil", "username": "client-single", "error": str(e)}
     )
 
@@ -32,19 +33,18 @@ def get_single_sentiment(content: str):
     
 
 @sub_router.post("/nlp/sentiment/batch", response_model=list[Sentiment])
-def get_multiple_sentiment(contents: list[str]):
-    sents:list[Sentiment] = []
-    for c in contents:
-        try :
-            sent:Sentiment = get_sentiment(c)
-        except Exception as e:
-                raise HarkonnenException(
-                    500,
-                    str(ErrorCodes.SENTIMENT_FAIL),
-                    f"RAG FAILED",
-                    {"platform": "nil", "username": "client-single", "error": str(e)}
-        )
-        sents.append(sent)
+async def get_multiple_sentiment(contents: list[str], batcher: SentimentBatcher = Depends(get_shared_batcher)):
+    """Run Finbert sentiment analysis on a list of Strings, batched with concurrent requests"""
+    try :
+        futures = [asyncio.wrap_future(f) for f in batcher.submit_many(contents)]
+        sents:list[Sentiment] = await asyncio.gather(*futures)
+    except Exception as e:
+            raise HarkonnenException(
+                500,
+                str(ErrorCodes.SENTIMENT_FAIL),
+                f"SENTIMENT FAILED",
+                {"platform": "nil", "username": "client-batch", "error": str(e)}
+    )
 
     return sents
          
@@ -53,11 +53,10 @@ def get_multiple_sentiment(contents: list[str]):
 
 # ----- Entities -----
 @sub_router.get("/nlp/entity/single/{content}", response_model=list[str])
-def get_entities_for_single_post(content: str, k: int):
+def get_entities_for_single_post(content: str, k: int, rag: RagStore = Depends(get_shared_store)):
     """return a relvant list of tickers for a single string of content"""
-    rag = RagStore()
     try :
-        results = rag.search(content, k)
+        results = rag.search(content, k, include_description=False)
         ret = []
         for r in results:
             ret.append(r["ticker"])
@@ -73,22 +72,20 @@ def get_entities_for_single_post(content: str, k: int):
 
 
 @sub_router.post("/nlp/entity/batch", response_model=list[list[str]])
-def get_entities_for_multiple_posts(contents: list[str], k: int):
+def get_entities_for_multiple_posts(contents: list[str], k: int, rag: RagStore = Depends(get_shared_store)):
     """Return list of relevant entities/tickers for a list a content"""
-    rag = RagStore()
+    try:
+        all_results = rag.search_many(contents, k, include_description=False)
+    except Exception as e:
+        raise HarkonnenException(
+            500,
+            str(ErrorCodes.RAG_FAIL),
+            f"RAG FAILED",
+            {"platform": "nil", "username": "client-batch", "error": str(e)}
+        )
+
     rets = []
-    for content in contents:
-        ret = []
-        try:
-            ret.append(rag.search(content, k))
-        except Exception as e:
-            raise HarkonnenException(
-                500,
-                str(ErrorCodes.RAG_FAIL),
-                f"RAG FAILED",
-                {"platform": "nil", "username": "client-batch", "error": str(e)}
-            )
-        rets.append(ret)
+    for results in all_results:
+        rets.append([r["ticker"] for r in results])
     return rets
 
-
@@ -2,24 +2,80 @@
     Sub router dedicated to Harkonnen's frontend dashboard
 """
 
-from fastapi import APIRouter, Query
+import enum
+import json
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from app.models.models import *
 from app.api.endpoints import TimeFrame, HarkonnenException
 
-from app.nlp.nlp import truth_social_pipeline, x_pipeline
+from app.nlp.nlp import truth_social_pipeline, x_pipeline, truth_social_stream, x_stream, influencer_scores
+from app.nlp.post_store import TRUTH_SOCIAL, X
+from app.nlp.rag.query_rag import RagStore, get_shared_store
 
 sub_router = APIRouter(tags = ["Master"])
 
+
+class StreamFormat(enum.Enum):
+    NDJSON = "ndjson"
+    SSE = "sse"
+
+
+async def encode_stream(events: AsyncIterator[dict], fmt: StreamFormat) -> AsyncIterator[str]:
+    """One JSON line per event (NDJSON) or one `event:` / `data:` block per event (SSE)"""
+    async for event in events:
+        data = json.dumps(event)
+        if fmt == StreamFormat.SSE:
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+        else:
+            yield data + "\n"
+
+
+def stream_response(events: AsyncIterator[dict], fmt: StreamFormat) -> StreamingResponse:
+    media_type = "text/event-stream" if fmt == StreamFormat.SSE else "application/x-ndjson"
+    return StreamingResponse(
+        encode_stream(events, fmt),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @sub_router.get("/process/ts/{influencer}", response_model= FrontEndReady)
-def process_batch_ts(influencer:str, limit: int = Query(20, ge=1, le=500)):
+async def process_batch_ts(influencer:str, limit: int = Query(20, ge=1, le=500), rag: RagStore = Depends(get_shared_store)):
     """process a batch of influencer, with a given limit and timeframe for TS"""
-    return truth_social_pipeline(influencer, limit)
+    return await truth_social_pipeline(influencer, limit, rag)
 
 
 
 @sub_router.get("/process/x/{influencer}", response_model= FrontEndReady)
-def process_batch_x(influencer:str, limit: int = Query(20, ge=1, le=200)):
+async def process_batch_x(influencer:str, limit: int = Query(20, ge=1, le=200), rag: RagStore = Depends(get_shared_store)):
     """process a batch of influencer, with a given limit and timeframe for X"""
     # TODO: X PIPELINE IMPLEMENTATION
-    return x_pipeline(influencer, limit)
-    
\ No newline at end of file
+    return await x_pipeline(influencer, limit, rag)
+
+
+@sub_router.get("/stream/ts/{influencer}")
+async def stream_batch_ts(influencer:str, limit: int = Query(20, ge=1, le=500), format: StreamFormat = StreamFormat.NDJSON,
+                          rag: RagStore = Depends(get_shared_store)):
+    """stream each PostProcessed for TS as soon as it is priced, followed by a summary with the influence scores"""
+    return stream_response(await truth_social_stream(influencer, limit, rag), format)
+
+
+@sub_router.get("/stream/x/{influencer}")
+async def stream_batch_x(influencer:str, limit: int = Query(20, ge=1, le=200), format: StreamFormat = StreamFormat.NDJSON,
+                         rag: RagStore = Depends(get_shared_store)):
+    """stream each PostProcessed for X as soon as it is priced, followed by a summary with the influence scores"""
+    return stream_response(await x_stream(influencer, limit, rag), format)
+
+
+@sub_router.get("/scores/ts/{influencer}", response_model=InfluencerScores)
+def scores_ts(influencer:str):
+    """running influence scores over every TS post processed so far"""
+    return influencer_scores(TRUTH_SOCIAL, influencer)
+
+
+@sub_router.get("/scores/x/{influencer}", response_model=InfluencerScores)
+def scores_x(influencer:str):
+    """running influence scores over every X post processed so far"""
+    return influencer_scores(X, influencer)
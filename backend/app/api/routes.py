@@ -1,8 +1,10 @@
 """
     Main Router For Harkonnen
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from pydantic import BaseModel
+from app.nlp.registry import registry
+from app.nlp.rag.query_rag import reload_shared_store
 from app.api.endpoints.client import sub_router as client_sub_router
 from app.api.endpoints.master import sub_router as master_sub_router
 
@@ -14,11 +16,30 @@ class MessageResponse(BaseModel):
     message: str
     status: str
 
+class ReadyResponse(BaseModel):
+    """Model readiness report."""
+    status: str
+    models: dict[str, str]
+
 @api_router.get("/health", response_model=MessageResponse)
 def health_check():
     """Health check endpoint example."""
     return MessageResponse(message="Backend is running", status="healthy")
 
+@api_router.get("/ready", response_model=ReadyResponse, responses={503: {"model": ReadyResponse}})
+def ready_check(response: Response):
+    """Readiness endpoint, 503 until every registered model is loaded."""
+    ready = registry.ready
+    if not ready:
+        response.status_code = 503
+    return ReadyResponse(status="ready" if ready else "loading", models=registry.status())
+
+@api_router.post("/rag/reload", response_model=MessageResponse)
+def reload_rag():
+    """Hot-swap the RAG store onto the index rebuilt by `python -m app.nlp.rag.build_rag`."""
+    store = reload_shared_store()
+    return MessageResponse(message=f"RAG index reloaded ({store.index.ntotal} vectors)", status="ok")
+
 # Include Subrouters
 api_router.include_router(client_sub_router, prefix = "/client")
 api_router.include_router(master_sub_router, prefix = "/master")
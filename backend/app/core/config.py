@@ -28,5 +28,60 @@ class Settings(BaseSettings):
     # CORS - Chrome Extension Support
     ALLOWED_ORIGINS: List[str]
 
+    # Models
+    MODEL_WARMUP: bool = True                # load models in the background at startup, else on first use
+
+    # Sentiment (FinBERT)
+    SENTIMENT_MAX_BATCH_TOKENS: int = 8192   # padded tokens per micro-batch
+    SENTIMENT_BACKEND: str = "torch"         # torch | torch-int8 | onnx | onnx-int8
+    SENTIMENT_ONNX_PATH: str = "app/data/finbert.onnx"  # exported graph, written on first onnx start
+    SENTIMENT_NUM_THREADS: int = 0           # intra-op threads (torch / onnxruntime), 0 = runtime default
+    SENTIMENT_WORKERS: int = 0               # scoring processes, each pinned to a slice of cores, 0 = score in-process
+    SENTIMENT_WORKER_THREADS: int = 0        # intra-op threads per worker process, 0 = size of its core slice
+    SENTIMENT_SHARD_SIZE: int = 16           # min posts per worker shard, smaller batches use one worker
+    SENTIMENT_WORKER_TIMEOUT: float = 60.0   # seconds a worker may take on one shard before it is restarted
+    SENTIMENT_BATCH_WAIT_MS: int = 10        # how long the batcher collects concurrent requests
+    SENTIMENT_MAX_BATCH_SIZE: int = 64       # max requests scored in one batcher pass
+    SENTIMENT_CACHE_SIZE: int = 50000        # in-memory LRU entries
+    SENTIMENT_CACHE_PATH: str = ""           # SQLite file for the on-disk tier, empty = memory only
+
+    # Entities
+    ENTITY_FUZZY_MATCH: bool = False          # also match misspelled company names (can mistake proper nouns for them)
+    ENTITY_FUZZY_CUTOFF: float = 83.0         # rapidfuzz ratio (0-100) a fuzzy match needs
+
+    # RAG
+    RAG_INDEX_MMAP: bool = True               # map the FAISS index and ticker table from disk, shared by every worker
+
+    # Posts
+    POST_STORE_PATH: str = "app/data/posts.sqlite"      # local post store, imported from the JSON exports when missing
+    RESULT_STORE_PATH: str = "app/data/results.sqlite"  # processed posts and per-influencer prediction totals
+
+    # Truth Social ingestion
+    TRUTH_SOCIAL_ACCOUNTS: List[str] = []        # accounts pulled by the background ingester
+    TRUTH_SOCIAL_INGEST_INTERVAL: float = 0.0    # seconds between ingest rounds, 0 = no background ingestion
+    INGEST_MAX_WORKERS: int = 4                  # accounts pulled at once
+    INGEST_BATCH_SIZE: int = 100                 # posts per post store write
+
+    # Master pipelines
+    PIPELINE_CPU_WORKERS: int = 4             # threads for entity matching, RAG search and price math
+    PIPELINE_IO_WORKERS: int = 16             # threads for post reads and market data fetches
+    PIPELINE_FETCH_CONCURRENCY: int = 8       # post batches being read at once
+    PIPELINE_SENTIMENT_CONCURRENCY: int = 8   # post batches waiting on the sentiment batcher at once
+    PIPELINE_ENTITY_CONCURRENCY: int = 4      # post batches in entity + RAG retrieval at once
+    PIPELINE_FINANCE_CONCURRENCY: int = 4     # post batches being priced at once
+    PIPELINE_STORE_CONCURRENCY: int = 8       # result store reads / writes in flight at once
+    PIPELINE_BATCH_SIZE: int = 16             # posts per pipeline batch (about one sentiment micro-batch)
+    PIPELINE_QUEUE_SIZE: int = 2              # batches buffered between two pipeline stages
+
+    # Market data
+    PRICE_STORE_DIR: str = "app/data/prices"  # local OHLCV store
+    MARKET_DATA_MAX_WORKERS: int = 8          # concurrent provider fetches
+    MARKET_DATA_RATE: float = 4.0             # provider requests per second (token bucket refill)
+    MARKET_DATA_BURST: int = 8                # token bucket capacity
+    MARKET_DATA_TIMEOUT: float = 10.0         # seconds per provider request
+    MARKET_DATA_RETRIES: int = 3              # attempts per fetch
+    MARKET_DATA_BACKOFF: float = 0.5          # seconds, doubled after each failed attempt
+    MARKET_DATA_EMPTY_TTL: float = 86400.0    # seconds an empty provider answer is cached, 0 = always refetch
+
 
 settings = Settings()
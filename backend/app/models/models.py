@@ -50,4 +50,11 @@ class PostProcessed(PostEntity):
 class FrontEndReady(BaseModel):
     one_day_influence_score: float
     seven_day_influence_score: float
-    posts: List[PostProcessed]
\ No newline at end of file
+    posts: List[PostProcessed]
+
+class InfluencerScores(BaseModel):
+    """Running scores over every post of an influencer processed so far"""
+    one_day_influence_score: float
+    seven_day_influence_score: float
+    posts: int
+    tickers: int
@@ -0,0 +1,215 @@
+"""
+    Token-level Aho-Corasick matcher for company aliases
+"""
+
+import re
+
+from rapidfuzz import fuzz, process
+
+# words, cashtags and possessives ("McDonald's" -> "mcdonalds", matching the cleaned aliases)
+TOKEN_RE = re.compile(r"\$?\w+(?:['’]\w+)*")
+APOSTROPHES_RE = re.compile(r"['’$]")
+
+# lowercase words allowed inside a capitalized company name ("Bank of America")
+CONNECTORS = {"of", "and", "the", "de", "du"}
+
+# symbols that are also everyday words or abbreviations ("ALL", "NOW", "ICE", "PM"),
+# these only count as cashtags ("$NOW"), never as bare all-caps tokens
+WORD_SYMBOLS = {
+    "ALL", "AMP", "APA", "ARE", "BALL", "BEN", "BIO", "CAT", "COST", "DE", "DIS", "DISH", "DOW",
+    "EA", "ED", "EL", "ES", "FAST", "FOX", "GEN", "HAS", "HUM", "ICE", "IT", "KEY", "KEYS", "LOW",
+    "MA", "MAR", "MAS", "MET", "MO", "MS", "NI", "NOW", "ON", "PEAK", "PEG", "PH", "PM", "POOL",
+    "PSA", "RE", "REG", "SEE", "SO", "TAP", "TECH", "TEL", "UPS", "USB", "WAT", "WELL",
+}
+
+
+def _key(token: str) -> str:
+    return APOSTROPHES_RE.sub("", token).lower()
+
+
+def _capitalized(token: str) -> bool:
+    """Title case, all caps, a leading digit or a camel-case brand ("eBay")"""
+    token = token.lstrip("$")
+    return bool(token) and (token[0].isupper() or token[0].isdigit() or not token.islower())
+
+
+def _shouting(token: str) -> bool:
+    return len(token) > 1 and token.isupper()
+
+
+class AliasMatcher:
+    """Aho-Corasick automaton over alias token sequences, one linear pass per text
+
+    Name aliases match capitalized words ("Apple", "Apple Inc", "Bank of America").
+    Symbol aliases (the ticker itself) match cashtags ("$AAPL") or bare all-caps
+    tokens that are not part of an all-caps run, so shouted words like "NOW" in
+    "BUY AMERICAN NOW" do not turn into tickers. Symbols that are English words
+    (WORD_SYMBOLS) only match as cashtags.
+    """
+
+    def __init__(self, alias_map: dict[str, str], symbols: set[str] = frozenset()):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, str, bool]]] = [[]]  # (token length, ticker, is_symbol)
+
+        for alias, ticker in alias_map.items():
+            tokens = alias.split()
+            if tokens:
+                self._add(tokens, ticker, alias in symbols)
+        self._link()
+
+
+    def _add(self, tokens: list[str], ticker: str, is_symbol: bool) -> None:
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(tokens), ticker, is_symbol))
+
+
+    def _link(self) -> None:
+        """Breadth-first failure links, outputs of the fallback state are inherited"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+
+    def _accept(self, raw: list[str], start: int, end: int, is_symbol: bool) -> bool:
+        if is_symbol:
+            token = raw[start]
+            if token.startswith("$"):
+                return True
+            if not _shouting(token) or token in WORD_SYMBOLS:
+                return False
+            before = raw[start - 1] if start > 0 else ""
+            after = raw[end + 1] if end + 1 < len(raw) else ""
+            return not (_shouting(before) or _shouting(after))
+
+        if not _capitalized(raw[start]) or not _capitalized(raw[end]):
+            return False
+        return all(_capitalized(t) or t.lower() in CONNECTORS for t in raw[start:end + 1])
+
+
+    def find(self, text: str) -> set[str]:
+        """Return every ticker whose alias appears in text"""
+        raw = TOKEN_RE.findall(text)
+        tickers = set()
+        state = 0
+        for i, token in enumerate(raw):
+            key = _key(token)
+            while state and key not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(key, 0)
+            for length, ticker, is_symbol in self._out[state]:
+                if ticker not in tickers and self._accept(raw, i - length + 1, i, is_symbol):
+                    tickers.add(ticker)
+        return tickers
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyAliasIndex:
+    """Misspelled company names ("Nvidea", "Mircosoft") scored with rapidfuzz
+
+    Candidates are blocked by (first letter, character trigram) so each phrase is
+    only scored against aliases that share its first letter and enough trigrams,
+    and all phrases of a batch of posts are scored in one process.cdist call.
+    Single words spelled exactly like a word of some alias ("Energy", "General")
+    are skipped: they are ordinary words, not misspelled names.
+    """
+
+    def __init__(self, alias_map: dict[str, str], symbols: set[str] = frozenset(), min_length: int = 5, max_tokens: int = 3):
+        self.min_length = min_length   # shortest phrase worth a fuzzy lookup
+        self.max_tokens = max_tokens
+        self.exact = set(alias_map)
+        self.aliases = [a for a in alias_map if a not in symbols and len(a) >= 4]
+        self.tickers = [alias_map[a] for a in self.aliases]
+        self.words = {word for alias in self.aliases for word in alias.split()}
+
+        self.blocks: dict[tuple[str, str], list[int]] = {}
+        for i, alias in enumerate(self.aliases):
+            for gram in _trigrams(alias):
+                self.blocks.setdefault((alias[0], gram), []).append(i)
+
+
+    def phrases(self, text: str) -> list[str]:
+        """Capitalized 1..max_tokens word phrases that are neither exact aliases nor a single known alias word"""
+        raw = TOKEN_RE.findall(text)
+        out = []
+        for start in range(len(raw)):
+            if not _capitalized(raw[start]) or raw[start].startswith("$"):
+                continue
+            for end in range(start, min(start + self.max_tokens, len(raw))):
+                if not _capitalized(raw[end]):
+                    break
+                phrase = " ".join(_key(t) for t in raw[start:end + 1])
+                if len(phrase) < self.min_length or phrase in self.exact:
+                    continue
+                if start == end and phrase in self.words:
+                    continue
+                out.append(phrase)
+        return out
+
+
+    def candidates(self, phrase: str, min_shared: float = 0.5) -> list[int]:
+        """Alias ids sharing the phrase's first letter and at least min_shared of its trigrams"""
+        grams = _trigrams(phrase)
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for i in self.blocks.get((phrase[0], gram), ()):
+                shared[i] = shared.get(i, 0) + 1
+        need = min_shared * len(grams)
+        return [i for i, n in shared.items() if n >= need]
+
+
+    def match_many(self, texts: list[str], score_cutoff: float) -> list[dict[str, float]]:
+        """Return {ticker: confidence 0..1} per text, best fuzzy score per ticker"""
+        results: list[dict[str, float]] = [{} for _ in texts]
+
+        # 1. Block: phrases per text and their candidate aliases
+        queries: list[tuple[int, str, list[int]]] = []
+        for t, text in enumerate(texts):
+            for phrase in dict.fromkeys(self.phrases(text)):
+                cands = self.candidates(phrase)
+                if cands:
+                    queries.append((t, phrase, cands))
+        if not queries:
+            return results
+
+        # 2. Score every phrase against the union of candidates in one cdist call
+        columns = sorted({i for _, _, cands in queries for i in cands})
+        column_of = {alias_id: c for c, alias_id in enumerate(columns)}
+        scores = process.cdist(
+            [phrase for _, phrase, _ in queries],
+            [self.aliases[i] for i in columns],
+            scorer=fuzz.ratio,
+            score_cutoff=score_cutoff,
+            workers=1
+        )
+
+        # 3. Keep only blocked pairs, best score per ticker
+        for row, (t, _, cands) in enumerate(queries):
+            for i in cands:
+                score = scores[row, column_of[i]]
+                if score >= score_cutoff:
+                    ticker = self.tickers[i]
+                    confidence = float(score) / 100
+                    if confidence > results[t].get(ticker, 0.0):
+                        results[t][ticker] = confidence
+        return results
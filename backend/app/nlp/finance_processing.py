@@ -2,12 +2,14 @@ from __future__ import annotations
 import argparse
 import logging
 import sys
-import yfinance as yf
 from datetime import datetime, timezone
 from dataclasses import dataclass, asdict, field
 from typing import List, Optional, Any, Dict
+import numpy as np
 import pandas as pd
 from app.models.models import PostEntity, PostProcessed, PriceChanges, FrontEndReady
+from app.nlp.market_data import plan_fetches
+from app.nlp.price_store import PriceStore, get_shared_price_store
 # !!!! call process_posts(List[PostEntity]) from outside this module !!!!
 # !!!! receives FrontEndReady object with all data filled in !!!!
 
@@ -27,17 +29,178 @@ def setup_logging(verbose: bool = False) -> None:
 # -------------------------
 # Core transformation
 # -------------------------
+ONE_DAY = pd.Timedelta(hours=24).value      # ns
+SEVEN_DAYS = pd.Timedelta(hours=168).value  # ns
+OFFSETS = np.array([0, ONE_DAY, SEVEN_DAYS], dtype=np.int64)
+
+
+@dataclass
+class PricePlan:
+    """Every (post, ticker) pair of a request, as flat arrays"""
+    post_idx: np.ndarray      # index into the request's posts
+    tickers: np.ndarray       # ticker symbol per pair
+    t0: np.ndarray            # post time, UTC ns
+    direction: np.ndarray     # +1 positive, -1 negative, 0 no call
+    intervals: List[str] = field(default_factory=list)
+    starts: List[pd.Timestamp] = field(default_factory=list)
+    ends: List[pd.Timestamp] = field(default_factory=list)
+
+
+def post_time(post: PostEntity) -> datetime:
+    dt = post.timestamp # time of post
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)   # If naive, assume it's *already* UTC
+    return dt.astimezone(timezone.utc)
+
+
+def sentiment_direction(post: PostEntity) -> int:
+    if post.sentiment.positive >= 0.3:
+        return 1
+    if post.sentiment.negative >= 0.3:
+        return -1
+    return 0
+
+
+def is_priced(post: PostEntity, now: datetime) -> bool:
+    """Posts from the last 7 days are not priced yet (no 7-day move to compare against)"""
+    return (now - post_time(post)).days > 7
+
+
+def prediction_counts(post: PostProcessed, now: datetime | None = None) -> tuple[int, int, int]:
+    """(1d hits, 7d hits, ticker count) of one processed post, counted the way transform_posts counts a request"""
+    now = now or datetime.now(timezone.utc)
+    if not is_priced(post, now):
+        return 0, 0, 0
+    direction = sentiment_direction(post)
+    one_day_hits = sum(direction * np.sign(c.one_day) > 0 for c in post.price_changes)
+    seven_day_hits = sum(direction * np.sign(c.seven_day) > 0 for c in post.price_changes)
+    return int(one_day_hits), int(seven_day_hits), len(post.tickers)
+
+
+def plan_prices(posts: List[PostEntity]) -> PricePlan:
+    """Collect the (post, ticker) pairs that need prices, posts from the last 7 days are skipped"""
+    now = datetime.now(timezone.utc)
+    post_idx, tickers, t0, direction = [], [], [], []
+    intervals, starts, ends = [], [], []
+
+    for i, post in enumerate(posts):
+        if not is_priced(post, now):   # if within 7 days, just do nothing lmao
+            continue
+        dt = post_time(post)
+        days_ago = (now - dt).days # how many days ago was ts
+        interval = "2m" if days_ago <= 50 else "1d" # if within 50 days (60 days hard cutoff - 7days and then safety padding), then 2min, otherwise 1d
+        start_date = dt - pd.Timedelta(days=1) # one day before
+        end_date = dt + pd.Timedelta(days=10) # ten days later for more leeway
+        for ticker in post.tickers:
+            post_idx.append(i)
+            tickers.append(ticker)
+            t0.append(pd.Timestamp(dt).value)
+            direction.append(sentiment_direction(post))
+            intervals.append(interval)
+            starts.append(start_date)
+            ends.append(end_date)
+
+    return PricePlan(
+        post_idx=np.array(post_idx, dtype=np.int64),
+        tickers=np.array(tickers, dtype=object),
+        t0=np.array(t0, dtype=np.int64),
+        direction=np.array(direction, dtype=np.int8),
+        intervals=intervals,
+        starts=starts,
+        ends=ends,
+    )
+
+
+def fetch_series(plan: PricePlan, store: PriceStore | None = None) -> Dict[Any, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Load price history once per ticker and interval, returns {series key: (pair indices, UTC ns index, closes)}"""
+    if store is None:
+        store = get_shared_price_store()
+    fetch_plan = plan_fetches(zip(plan.tickers, plan.intervals, plan.starts, plan.ends))
+    closes = store.closes_for(fetch_plan)
+
+    pairs_by_key: Dict[tuple[str, str], List[int]] = {}
+    for j, key in enumerate(zip(plan.tickers, plan.intervals)):
+        pairs_by_key.setdefault(key, []).append(j)
+
+    series = {}
+    for key, pairs in pairs_by_key.items():
+        close = closes.get(key)
+        if close is None:
+            logging.warning(f"No data found for ticker {key[0]}")
+            continue
+        index = close.index.as_unit("ns").asi8
+        series[key] = (np.array(pairs), index, close.to_numpy(dtype=np.float64))
+    return series
+
+
+def nearest_prices(index: np.ndarray, closes: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Close of the first bar at or after each target (NaN past the end of the series)"""
+    pos = np.searchsorted(index, targets, side="left")
+    found = pos < len(index)
+    return np.where(found, closes[np.minimum(pos, len(index) - 1)], np.nan)
+
+
+def price_matrix(plan: PricePlan, series) -> np.ndarray:
+    """(pairs, 3) prices at t0, t+24h and t+168h, one searchsorted per series"""
+    prices = np.full((len(plan.t0), 3), np.nan)
+    for pairs, index, closes in series.values():
+        targets = plan.t0[pairs, None] + OFFSETS[None, :]
+        prices[pairs] = nearest_prices(index, closes, targets.ravel()).reshape(-1, 3)
+    return prices
+
+
+def transform_posts(posts: List[PostEntity], store: PriceStore | None = None) -> tuple[List[PostProcessed], int, int, int]:
+    """Price every post of a request, returns (processed posts, 1d hits, 7d hits, ticker count)"""
+    plan = plan_prices(posts)
+    prices = price_matrix(plan, fetch_series(plan, store))
+
+    # 1. Changes for every pair at once
+    original, price_24h, price_7d = prices[:, 0], prices[:, 1], prices[:, 2]
+    ok = ~np.isnan(prices).any(axis=1)
+    one_day_change = price_24h - original
+    seven_day_change = price_7d - original
+    with np.errstate(divide="ignore", invalid="ignore"):
+        one_day_percent = one_day_change / original * 100
+        seven_day_percent = seven_day_change / original * 100
+
+    for ticker in plan.tickers[np.isnan(original)]:
+        logging.warning(f"Could not get original price for {ticker}")
+    for ticker in plan.tickers[~np.isnan(original) & ~ok]:
+        logging.warning(f"Could not get future prices for {ticker}")
+
+    # 2. Prediction hits: sentiment direction agrees with the sign of the move
+    one_day_hits = ok & (plan.direction * np.sign(one_day_change) > 0)
+    seven_day_hits = ok & (plan.direction * np.sign(seven_day_change) > 0)
+
+    # 3. Assemble output in post / ticker order
+    price_changes: List[List[PriceChanges]] = [[] for _ in posts]
+    for j in np.flatnonzero(ok):
+        price_changes[plan.post_idx[j]].append(PriceChanges(
+            ticker=plan.tickers[j],
+            one_day=one_day_change[j],
+            seven_day=seven_day_change[j],
+            one_day_percent=one_day_percent[j],
+            seven_day_percent=seven_day_percent[j],
+        ))
+
+    processed_posts = [
+        PostProcessed(
+            post_id=post.post_id,
+            timestamp=post.timestamp,
+            username=post.username,
+            content=post.content,
+            sentiment=post.sentiment,
+            tickers=post.tickers,
+            price_changes=changes
+        )
+        for post, changes in zip(posts, price_changes)
+    ]
+
+    return processed_posts, int(one_day_hits.sum()), int(seven_day_hits.sum()), len(plan.t0)
+
+
 def transform_list(posts: List[PostEntity]) -> FrontEndReady:
-    one_day_predicts_total = 0
-    seven_day_predicts_total = 0
-    processed_posts = []
-    total_tickers = 0
-    for post in posts:
-        processed_post, one_day_predicts, seven_day_predicts, ticker_count = transform_post(post)
-        one_day_predicts_total += one_day_predicts
-        seven_day_predicts_total += seven_day_predicts
-        total_tickers += ticker_count
-        processed_posts.append(processed_post)
+    processed_posts, one_day_predicts_total, seven_day_predicts_total, total_tickers = transform_posts(posts)
     if total_tickers == 0:
         one_day_influence_score = 0
         seven_day_influence_score = 0
@@ -55,97 +218,8 @@ def transform_list(posts: List[PostEntity]) -> FrontEndReady:
 
 
 def transform_post(post: PostEntity) -> tuple[PostProcessed, int, int, int]: # this is going to 1. provide price_changes for each ticker, 2. return number of true predicts (for each ticker)
-    price_changes = [] # one change fr eaach tiker
-    total_seven_predicts = 0
-    total_one_predicts = 0
-    ticker_count = 0
-    if post.sentiment.positive >= 0.3:
-        sentiment = "positive"
-    elif post.sentiment.negative >= 0.3:
-        sentiment = "negative"
-    else:
-        sentiment = ""
-    dt = post.timestamp # time of post
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)   # If naive, assume it's *already* UTC
-    else:
-        dt = dt.astimezone(timezone.utc)   
-    days_ago = (datetime.now(timezone.utc) - dt).days # how many days ago was ts
-    interval = "2m" if days_ago <= 50 else "1d" # if within 50 days (60 days hard cutoff - 7days and then safety padding), then 2min, otherwise 1d
-    start_date = dt - pd.Timedelta(days=1) # one day before
-    end_date = dt + pd.Timedelta(days=10) # ten days later for more leeway
-    
-    if days_ago <= 7:   # if within 7 days, just do nothing lmao
-        processed_post = PostProcessed(
-        post_id=post.post_id,
-        timestamp=post.timestamp,
-        username=post.username,
-        content=post.content,
-        sentiment=post.sentiment,
-        tickers=post.tickers,
-        price_changes=[]
-        )
-        return processed_post, 0, 0, 0
-
-    for ticker in post.tickers:
-        ticker_count += 1
-        
-        
-        ticker_data = yf.Ticker(ticker).history(start=start_date, end=end_date, interval=interval) # this spits out open, close for each two minutes within time frame, or by day bepeding on interbal
-
-        if ticker_data.empty:
-            logging.warning(f"No data found for ticker {ticker}")
-            continue
-        
-        ticker_data.index = ticker_data.index.tz_convert('UTC')
-        original_price = get_nearest_price(dt, ticker_data) # should get price at time of post
-        if original_price is None:
-            logging.warning(f"Could not get original price for {ticker}")
-            continue
-        price_24h = get_nearest_price(dt + pd.Timedelta(hours = 24), ticker_data)
-        price_7d = get_nearest_price(dt + pd.Timedelta(hours = 168), ticker_data)
-        if price_24h is None or price_7d is None:
-            logging.warning(f"Could not get future prices for {ticker}")
-            continue
-       
-        one_day_change = price_24h - original_price
-        seven_day_change = price_7d - original_price
-
-        if sentiment:
-            if (sentiment == "positive" and one_day_change > 0) or (sentiment == "negative" and one_day_change < 0):
-                total_one_predicts += 1
-            if (sentiment == "positive" and seven_day_change > 0) or (sentiment == "negative" and seven_day_change < 0):
-                total_seven_predicts += 1
-            
-        price_change = PriceChanges(ticker=ticker,
-                                    one_day=one_day_change,
-                                    seven_day=seven_day_change,
-                                    one_day_percent=one_day_change/original_price * 100,
-                                    seven_day_percent=seven_day_change/original_price * 100,)
-        price_changes.append(price_change)
-
-    processed_post = PostProcessed(
-        post_id=post.post_id,
-        timestamp=post.timestamp,
-        username=post.username,
-        content=post.content,
-        sentiment=post.sentiment,
-        tickers=post.tickers,
-        price_changes=price_changes
-    )
-
-    return processed_post, total_one_predicts, total_seven_predicts, ticker_count
-
-        
-
-def get_nearest_price(target_time, ticker_data):
-    target_time = pd.to_datetime(target_time, utc=True)
-    pos = ticker_data.index.get_indexer([target_time], method='bfill')[0]
-
-    if pos == -1:
-        return None
-
-    return float(ticker_data.iloc[pos]['Close'])
+    processed_posts, total_one_predicts, total_seven_predicts, ticker_count = transform_posts([post])
+    return processed_posts[0], total_one_predicts, total_seven_predicts, ticker_count
 
 
 def process_posts(posts: List[PostEntity], verbose: bool = False) -> FrontEndReady:
@@ -1,30 +1,38 @@
 from datetime import datetime
-import re
-import pandas as pd
-import kagglehub
+import csv
+import hashlib
 import os
+import pickle
+import re
 from rapidfuzz import process, fuzz
 from pprint import pprint
 
 
 from app.models.models import PostSentiment, Sentiment, PostEntity
-
-# Download latest version
+from app.nlp.alias_matcher import WORD_SYMBOLS, AliasMatcher, FuzzyAliasIndex
+from app.core.config import settings
+from app.nlp.registry import registry
 
 # Get path relative to this file
 current_dir = os.path.dirname(__file__)
 csv_path = os.path.join(current_dir, "sp500-companies.csv")
+index_path = os.path.join(current_dir, "alias_index.pkl")
+
+# bump when the alias rules or the AliasMatcher layout change
+ALIAS_INDEX_VERSION = 5
 
-df = pd.read_csv(csv_path, encoding="latin-1")
 
-alias_map = {}
+def read_companies(path=csv_path):
+    with open(path, newline="", encoding="latin-1") as f:
+        return list(csv.DictReader(f))
 
-def build_alias_map(df):
+
+def build_alias_map(rows):
     alias_map = {}
 
     corporate_suffixes = ["inc", "corp", "corporation", "co", "company"]
 
-    for _, row in df.iterrows():
+    for row in rows:
         name = str(row["Name"]).lower()
         ticker = str(row["Ticker"])
 
@@ -48,21 +56,88 @@ def build_alias_map(df):
 
     return alias_map
 
-alias_map = build_alias_map(df)
 
-def clean(text: str):
-    matches = re.findall(r'\b(?:[A-Z][a-z]*\b(?:\s+[A-Z][a-z]*)*)', text)
-    return [m.lower() for m in matches]
+def symbol_aliases(rows) -> set[str]:
+    """Ticker aliases that only match as symbols ($ETR, all-caps ETR), never as a company name
 
-def ticker_builder(post: PostSentiment):
-    words = clean(post.content)
-    print(words)
-    tickers = set()
-    
-    for alias, ticker in alias_map.items():
-        if alias in words:
-            tickers.add(ticker)
-    
+    A ticker that is also a word of its company's name ("meta" in Meta Platforms,
+    "ebay", "wynn") is a name as well, unless it is an everyday word (WORD_SYMBOLS).
+    """
+    symbols = set()
+    for row in rows:
+        ticker = str(row["Ticker"])
+        words = re.sub(r"[^\w\s]", "", str(row["Name"]).lower()).split()
+        if ticker in WORD_SYMBOLS or ticker.lower() not in words:
+            symbols.add(ticker.lower())
+    return symbols
+
+
+def csv_digest(path=csv_path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_alias_index(path=csv_path, out_path=index_path) -> dict:
+    """Compile alias map + matchers from the CSV and write them as one pickle (atomic rename)"""
+    rows = read_companies(path)
+    alias_map = build_alias_map(rows)
+    symbols = symbol_aliases(rows)
+    index = {
+        "version": ALIAS_INDEX_VERSION,
+        "csv_sha256": csv_digest(path),
+        "alias_map": alias_map,
+        "matcher": AliasMatcher(alias_map, symbols),
+        "fuzzy": FuzzyAliasIndex(alias_map, symbols),
+    }
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out_path)
+    return index
+
+
+def load_alias_index(path=csv_path, out_path=index_path) -> dict:
+    """Load the prebuilt index, rebuilding it only when the CSV (or index version) changed"""
+    try:
+        with open(out_path, "rb") as f:
+            index = pickle.load(f)
+        if index.get("version") == ALIAS_INDEX_VERSION and index.get("csv_sha256") == csv_digest(path):
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    return build_alias_index(path, out_path)
+
+
+registry.register("alias_index", load_alias_index)
+
+
+def get_matcher() -> AliasMatcher:
+    return registry.get("alias_index")["matcher"]
+
+
+def get_fuzzy_index() -> FuzzyAliasIndex:
+    return registry.get("alias_index")["fuzzy"]
+
+
+def match_tickers_many(texts: list[str]) -> list[dict[str, float]]:
+    """{ticker: confidence} per text, exact alias hits have confidence 1.0"""
+    if settings.ENTITY_FUZZY_MATCH:
+        results = get_fuzzy_index().match_many(texts, settings.ENTITY_FUZZY_CUTOFF)
+    else:
+        results = [{} for _ in texts]
+
+    matcher = get_matcher()
+    for text, found in zip(texts, results):
+        for ticker in matcher.find(text):
+            found[ticker] = 1.0
+    return results
+
+
+def match_tickers(text: str) -> dict[str, float]:
+    return match_tickers_many([text])[0]
+
+
+def to_entity(post: PostSentiment, tickers) -> PostEntity:
     return PostEntity(post_id=post.post_id,
                       timestamp=post.timestamp,
                       username=post.username,
@@ -71,16 +146,28 @@ def ticker_builder(post: PostSentiment):
                       tickers=list(tickers)
                      )
 
+def ticker_builder(post: PostSentiment):
+    return to_entity(post, match_tickers(post.content))
+
 def build_all(everything):
+    # one blocked cdist pass for the whole batch
+    matches = match_tickers_many([thing.content for thing in everything])
     list_of_entities = []
-    for thing in everything:
-        thingy = ticker_builder(thing)
+    for thing, found in zip(everything, matches):
+        thingy = to_entity(thing, found)
         list_of_entities.append(thingy)
         
     return list_of_entities
 
 if __name__ == "__main__":
-    content = "Apple and Microsoft Corp are leading tech giants. I love AAPL and MSFT stocks!"
+    import sys
+    if "--build" in sys.argv:
+        # offline build step: python -m app.nlp.fuzzy --build
+        built = build_alias_index()
+        print(f"Wrote {index_path} ({len(built['alias_map'])} aliases, csv {built['csv_sha256'][:12]})")
+        raise SystemExit(0)
+
+    content = "Apple and Mircosoft Corp are leading tech giants. I love AAPL and MSFT stocks!"
     post_entity = ticker_builder(PostSentiment(
         post_id="1",
         timestamp=datetime(2025, 11, 15, 14, 30, 0) ,
@@ -89,4 +176,5 @@ if __name__ == "__main__":
         sentiment=Sentiment(positive=0.9, negative=0.05, neutral=0.05)
     ))
     print(post_entity)
+    print(match_tickers(content))
     
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+    Market data providers and fetch planning for finance processing
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Protocol, Tuple
+
+import pandas as pd
+
+Window = Tuple[pd.Timestamp, pd.Timestamp]
+SeriesKey = Tuple[str, str]                 # (ticker, interval)
+RangeKey = Tuple[str, pd.Timestamp, pd.Timestamp]  # (interval, start, end)
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def merge_windows(windows: Iterable[Window]) -> List[Window]:
+    """Collapse overlapping / touching [start, end) windows into the minimal set of ranges"""
+    merged: List[Window] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def plan_fetches(requests: Iterable[Tuple[str, str, pd.Timestamp, pd.Timestamp]]) -> Dict[RangeKey, List[str]]:
+    """Turn (ticker, interval, start, end) requests into {(interval, start, end): tickers}
+
+    Windows are merged per ticker and interval first, tickers that end up with the
+    exact same range (e.g. tickers mentioned by the same post) are fetched together.
+    """
+    windows: Dict[SeriesKey, List[Window]] = defaultdict(list)
+    for ticker, interval, start, end in requests:
+        windows[(ticker, interval)].append((pd.Timestamp(start), pd.Timestamp(end)))
+
+    plan: Dict[RangeKey, List[str]] = defaultdict(list)
+    for (ticker, interval), ticker_windows in windows.items():
+        for start, end in merge_windows(ticker_windows):
+            plan[(interval, start, end)].append(ticker)
+    return dict(plan)
+
+
+# -------------------------
+# Providers
+# -------------------------
+class PriceProvider(Protocol):
+    """Source of OHLCV bars, frames are indexed in UTC and keyed by ticker"""
+
+    def fetch(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        ...
+
+
+def _normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    if frame is None or frame.empty or "Close" not in frame:
+        return pd.DataFrame(columns=OHLCV)
+    frame = frame.reindex(columns=OHLCV).dropna(subset=["Close"])
+    frame.index = frame.index.tz_convert("UTC")
+    return frame
+
+
+class YFinanceProvider:
+    """Yahoo Finance, several symbols of the same range go through a single yf.download"""
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+
+    def fetch(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        if len(tickers) == 1:
+            frames = {tickers[0]: yf.Ticker(tickers[0]).history(start=start, end=end, interval=interval, timeout=self.timeout)}
+        else:
+            data = yf.download(
+                tickers, start=start, end=end, interval=interval, timeout=self.timeout,
+                group_by="ticker", auto_adjust=True, ignore_tz=False, progress=False, threads=False
+            )
+            present = set(data.columns.get_level_values(0)) if not data.empty else set()
+            frames = {t: data[t] if t in present else None for t in tickers}
+
+        return {ticker: _normalize_frame(frame) for ticker, frame in frames.items()}
+
+
+class InMemoryProvider:
+    """Serves fixed frames keyed by (ticker, interval), for tests and offline runs"""
+
+    def __init__(self, frames: Dict[SeriesKey, pd.DataFrame]):
+        self.frames = {key: _normalize_frame(frame) for key, frame in frames.items()}
+        self.calls: List[Tuple[Tuple[str, ...], str, pd.Timestamp, pd.Timestamp]] = []
+
+    def fetch(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        self.calls.append((tuple(tickers), interval, start, end))
+        out = {}
+        for ticker in tickers:
+            frame = self.frames.get((ticker, interval), pd.DataFrame(columns=OHLCV))
+            if not frame.empty:
+                frame = frame[(frame.index >= start) & (frame.index < end)]
+            out[ticker] = frame
+        return out
+
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a token is available"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedProvider:
+    """Wraps a provider with a shared token bucket and retry with exponential backoff"""
+
+    def __init__(self, provider: PriceProvider, bucket: TokenBucket, retries: int = 3, backoff: float = 0.5):
+        self.provider = provider
+        self.bucket = bucket
+        self.retries = max(1, retries)
+        self.backoff = backoff
+
+    def fetch(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.provider.fetch(tickers, interval, start, end)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"Fetch {tickers} {interval} failed (attempt {attempt}/{self.retries}): {e}")
+                time.sleep(delay)
+                delay *= 2
@@ -1,175 +1,296 @@
-""" 
+"""
     Combined Pipeline for Harkonnen
 """
 
-import json
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, time, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, Iterator
 from app.api.endpoints import TimeFrame, HarkonnenException
 from app.models.models import *
-from app.nlp.truth_social import get_posts
-from app.nlp.sentiment import get_sentiment_batch
-from app.nlp.finance_processing import process_posts
-from app.tools.twitter_scraper.interpreter import get_tweets
+from app.core.config import settings
+from app.nlp.finance_processing import transform_posts, prediction_counts
+from app.nlp.post_store import TRUTH_SOCIAL, X, get_shared_post_store
+from app.nlp.result_store import ResultStore, StoredResult, get_shared_result_store, is_final
 from app.nlp.semantic_search import append_rag_results
+from app.nlp.rag.query_rag import RagStore
+from app.nlp.sentiment_batcher import SentimentBatcher, get_shared_batcher
+from app.nlp.stage_runner import StageRunner, get_shared_runner
+from app.nlp.pipeline import Pipeline, Stage, blocking_source, chunked
 from app.nlp import ErrorCodes
 from app.nlp.fuzzy import build_all
 
 
-JSON_FILE = "trump_posts_500.json"
+# (processed posts, 1d hits, 7d hits, ticker count) per batch, see transform_posts
+PricedBatches = AsyncIterator[tuple[list[PostProcessed], int, int, int]]
 
 
-def truth_social_pipeline(username:str, limit: int) -> PostProcessed:
-    """main pipeline using truth social data"""
-    
-    # 1. Fetch Post Data
-    try:
-        with open(JSON_FILE, "r") as f:
-            raw_data = json.load(f)
-            
-        
-        raw_posts:list[RawPost] = []
-        
-        for i, item in enumerate(raw_data):
-            if i >= limit:
-                break
-            try:
-                timestamp = datetime.fromisoformat(item['timestamp'])
-                raw_post = RawPost(
-                    post_id=item['post_id'],
-                    timestamp=timestamp,
-                    username=item['username'],
-                    content=item['content']
+def read_truth_social(username: str, limit: int) -> Iterator[RawPost]:
+    """Newest limit Truth Social posts of a user from the post store"""
+    yield from get_shared_post_store().latest(TRUTH_SOCIAL, username, limit)
+
+
+def read_tweets(username: str, days: int) -> Iterator[RawPost]:
+    """X posts of a user from the last days days, from the post store"""
+    oldest = datetime.combine(date.today() - timedelta(days=days), time(), tzinfo=timezone.utc)
+    yield from get_shared_post_store().since(X, username, oldest)
+
+
+async def score_posts(raw_posts: list[RawPost], batcher: SentimentBatcher) -> list[PostSentiment]:
+    """Score posts through the shared batcher and keep the ones with a clear direction"""
+    futures = [asyncio.wrap_future(f) for f in batcher.submit_many([p.content for p in raw_posts])]
+    sentiments:list[Sentiment] = await asyncio.gather(*futures)
+    return [
+        PostSentiment(**post.model_dump(), sentiment=sentiment)
+        for post, sentiment in zip(raw_posts, sentiments)
+        if sentiment.positive >= 0.33 or sentiment.negative >= 0.33
+    ]
+
+
+def _failure(platform: str, username: str, code: ErrorCodes, message: str, e: Exception) -> HarkonnenException:
+    return HarkonnenException(
+        500,
+        str(code),
+        message,
+        {"platform": platform, "username": username, "error": str(e)}
+    )
+
+
+@dataclass
+class StoredBatch:
+    """Final results of one source batch read back from the result store, passed through the stages as is"""
+    results: list[StoredResult]
+
+
+def fetch_batches(platform: str, label: str, username: str, fetch: Callable[[], Iterator[RawPost]],
+                  runner: StageRunner | None = None) -> AsyncIterator[list[RawPost]]:
+    """PIPELINE_BATCH_SIZE post batches read on the runner's I/O pool, one batch at a time"""
+    runner = runner or get_shared_runner()
+
+    async def source():
+        try:
+            async for batch in blocking_source(runner, "fetch", chunked(fetch(), settings.PIPELINE_BATCH_SIZE)):
+                yield batch
+        except Exception as e:
+            raise _failure(platform, username, ErrorCodes.SCRAPER_FAIL, f"{label} scraping failed for {username}", e)
+
+    return source()
+
+
+def build_pipeline(platform: str, label: str, username: str, batches: AsyncIterator[list[RawPost] | StoredBatch],
+                   rag: RagStore | None = None, runner: StageRunner | None = None,
+                   batcher: SentimentBatcher | None = None,
+                   on_dropped: Callable[[list[RawPost]], Awaitable[None]] | None = None) -> AsyncIterator:
+    """source → sentiment → entities → RAG → finance over post batches
+
+    StoredBatch items skip every stage and come out in their source position.
+    on_dropped receives the posts the sentiment filter removed from each batch.
+    """
+    runner = runner or get_shared_runner()
+    batcher = batcher or get_shared_batcher()
+
+    def passing(fn):
+        async def run(batch):
+            return batch if isinstance(batch, StoredBatch) else await fn(batch)
+        return run
+
+    # 1. Sentiment, batched with every other in-flight request (batches with no clear direction are dropped)
+    async def sentiment(raw_posts: list[RawPost]) -> list[PostSentiment] | None:
+        try:
+            async with runner.limit("sentiment"):
+                scored = await score_posts(raw_posts, batcher)
+        except Exception as e:
+            raise _failure(platform, username, ErrorCodes.SENTIMENT_FAIL, f"Sentiment analysis failed for {username}", e)
+        if on_dropped is not None and len(scored) < len(raw_posts):
+            kept = {post.post_id for post in scored}
+            await on_dropped([post for post in raw_posts if post.post_id not in kept])
+        return scored or None
+
+    # 2. Perform entity retrieval (CPU)
+    async def entities(sentiment_posts: list[PostSentiment]) -> list[PostEntity]:
+        try:
+            return await runner.cpu("entity", build_all, sentiment_posts)
+        except Exception as e:
+            raise _failure(platform, username, ErrorCodes.ENTITY_FAIL, f"Entity retrieval failed for {username}", e)
+
+    # 3. RAG Query (CPU)
+    async def rag_query(entity_posts: list[PostEntity]) -> list[PostEntity]:
+        try:
+            return await runner.cpu("entity", append_rag_results, entity_posts, 3, rag)
+        except Exception as e:
+            raise _failure(platform, username, ErrorCodes.RAG_FAIL, f"Entity retrieval augmented generation failed for {username}", e)
+
+    # 4. Perform Financial analysis (market data I/O + price math)
+    async def finance(entity_posts: list[PostEntity]):
+        try:
+            return await runner.io("finance", transform_posts, entity_posts)
+        except Exception as e:
+            raise _failure(platform, username, ErrorCodes.FINANCE_FAIL, f"Financial Analysis Failed for  {username}", e)
+
+    pipeline = Pipeline(
+        [
+            Stage("sentiment", passing(sentiment)),
+            Stage("entities", passing(entities)),
+            Stage("rag", passing(rag_query)),
+            Stage("finance", passing(finance)),
+        ],
+        settings.PIPELINE_QUEUE_SIZE
+    )
+    return pipeline.run(batches)
+
+
+async def materialized(source: str, platform: str, label: str, username: str, fetch: Callable[[], Iterator[RawPost]],
+                       rag: RagStore | None = None, runner: StageRunner | None = None,
+                       batcher: SentimentBatcher | None = None, results: ResultStore | None = None) -> PricedBatches:
+    """Stored final results as they are read, only the new / still-moving posts through the pipeline
+
+    Posts are looked up in the result store one source batch at a time, so
+    memory stays bounded and the first event does not wait for the whole
+    fetch. Every priced batch is persisted, so a post is processed again only
+    while it is inside the 7-day window (or its prices are still settling).
+    """
+    runner = runner or get_shared_runner()
+    results = results or get_shared_result_store()
+
+    # 1. Split every fetched batch into stored final results and posts still to process
+    async def lookup():
+        async for raw_posts in fetch_batches(platform, label, username, fetch, runner):
+            stored = await runner.io("store", results.get, source, [p.post_id for p in raw_posts])
+            done = [stored[p.post_id] for p in raw_posts if p.post_id in stored and stored[p.post_id].final]
+            todo = [p for p in raw_posts if p.post_id not in stored or not stored[p.post_id].final]
+            if done:
+                yield StoredBatch(done)
+            if todo:
+                yield todo
+
+    # 2. Posts the sentiment filter drops stay dropped
+    async def dropped(raw_posts: list[RawPost]):
+        await runner.io("store", results.put, source, username, [StoredResult(p.post_id, False, True) for p in raw_posts])
+
+    # 3. Through the staged pipeline, persisting each priced batch
+    async for batch in build_pipeline(platform, label, username, lookup(), rag, runner, batcher, dropped):
+        if isinstance(batch, StoredBatch):
+            kept = [r for r in batch.results if r.kept]
+            if kept:
+                yield (
+                    [r.post for r in kept],
+                    sum(r.one_day_hits for r in kept),
+                    sum(r.seven_day_hits for r in kept),
+                    sum(r.ticker_count for r in kept),
                 )
-                raw_posts.append(raw_post)
-            except Exception as e:
-                print(f"Skipping post {item.get('id')} due to error: {e}")
-        
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.SCRAPER_FAIL),
-            f"Truth Social scraping failed for {username}",
-            {"platform": "truth_social", "username": username, "error": str(e)}
-        )
-    
-    print(f"Fetched hihihhi raw posts")
-    # 2. Batch process for sentiment
-    try:
-        sentiment_posts:list[PostSentiment] = get_sentiment_batch(raw_posts)
-        sentiment_posts = [
-            post for post in sentiment_posts
-            if post.sentiment.positive >= 0.33 or post.sentiment.negative >= 0.33
-        ]
-            
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.SENTIMENT_FAIL),
-            f"Sentiment analysis failed for {username}",
-            {"platform": "truth_social", "username": username, "error": str(e)}
-        )
-    
-    print(f"Fetched helloooo raw posts")
-    # 3. Perform entity retrieval
-    try:
-        entity_posts:list[PostEntity] = build_all(sentiment_posts)
-        if entity_posts is None:
-            print(f"No posts found")
-            return FrontEndReady(posts=[])
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.ENTITY_FAIL),
-            f"Entity retrieval failed for {username}",
-            {"platform": "truth_social", "username": username, "error": str(e)}
-        )
-    try:
-        entity_post_plus_rag:list[PostEntity] = append_rag_results(entity_posts, 3)
-        
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.RAG_FAIL),
-            f"Entity retrieval augmented generation failed for {username}",
-            {"platform": "Truth Social", "username": username, "error": str(e)}
-        )
-    
-    # 4. Perform Financial analysis
+            continue
+
+        processed, one_day, seven_day, tickers = batch
+        now = datetime.now(timezone.utc)
+        rows = [StoredResult(post.post_id, True, is_final(post, now), *prediction_counts(post, now), post) for post in processed]
+        await runner.io("store", results.put, source, username, rows)
+        yield processed, one_day, seven_day, tickers
+
+
+def _scores(one_day_hits: int, seven_day_hits: int, ticker_count: int) -> tuple[float, float]:
+    if ticker_count == 0:
+        return 0.0, 0.0
+    return one_day_hits / ticker_count, seven_day_hits / ticker_count
+
+
+async def collect(batches: PricedBatches) -> FrontEndReady:
+    """Gather every priced batch into one FrontEndReady"""
+    posts: list[PostProcessed] = []
+    one_day_hits = seven_day_hits = ticker_count = 0
+    async for processed, one_day, seven_day, tickers in batches:
+        posts.extend(processed)
+        one_day_hits += one_day
+        seven_day_hits += seven_day
+        ticker_count += tickers
+
+    posts.sort(key=lambda post: post.timestamp, reverse=True)
+    one_day_influence_score, seven_day_influence_score = _scores(one_day_hits, seven_day_hits, ticker_count)
+    logging.info("Finished successfully - Processed %d posts", len(posts))
+    return FrontEndReady(
+        one_day_influence_score=one_day_influence_score,
+        seven_day_influence_score=seven_day_influence_score,
+        posts=posts
+    )
+
+
+async def events(batches: PricedBatches) -> AsyncIterator[dict]:
+    """Yield {"type": "post"} events as each batch is priced, then a {"type": "summary"} trailer
+
+    A failure after the response has started ends the stream with a
+    {"type": "error"} event, since the status code is already sent.
+    """
+    one_day_hits = seven_day_hits = ticker_count = post_count = 0
     try:
-        post_processed:FrontEndReady = process_posts(entity_post_plus_rag)
+        async for processed, one_day, seven_day, tickers in batches:
+            one_day_hits += one_day
+            seven_day_hits += seven_day
+            ticker_count += tickers
+            post_count += len(processed)
+            for post in processed:
+                yield {"type": "post", "post": post.model_dump(mode="json")}
+    except HarkonnenException as e:
+        yield {"type": "error", "detail": e.detail}
+        return
     except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.FINANCE_FAIL),
-            f"Financial Analysis Failed for  {username}",
-            {"platform": "truth_social", "username": username, "error": str(e)}
-        )
-    
-    return post_processed
-    
-    
-
-def x_pipeline(username:str, limit:int) -> PostProcessed:
+        # anything unexpected (provider, model, store) still closes the stream with an error event
+        logging.exception("Streaming pipeline failed")
+        error = HarkonnenException(500, str(ErrorCodes.PIPELINE_FAIL), "Pipeline failed while streaming", {"error": str(e)})
+        yield {"type": "error", "detail": error.detail}
+        return
+
+    one_day_influence_score, seven_day_influence_score = _scores(one_day_hits, seven_day_hits, ticker_count)
+    yield {
+        "type": "summary",
+        "one_day_influence_score": one_day_influence_score,
+        "seven_day_influence_score": seven_day_influence_score,
+        "posts": post_count,
+    }
+
+
+async def stream(batches: PricedBatches) -> AsyncIterator[dict]:
+    """Wait for the first event so a failure before any output is still an error response"""
+    stream_events = events(batches)
+    first = await anext(stream_events)
+    if first["type"] == "error":
+        detail = first["detail"]
+        raise HarkonnenException(500, detail["error_code"], detail["message"], detail.get("context"))
+
+    async def replay():
+        yield first
+        async for event in stream_events:
+            yield event
+
+    return replay()
+
+
+async def truth_social_pipeline(username:str, limit: int, rag: RagStore | None = None) -> FrontEndReady:
+    """main pipeline using truth social data"""
+    return await collect(materialized(TRUTH_SOCIAL, "truth_social", "Truth Social", username, lambda: read_truth_social(username, limit), rag))
+
+
+async def x_pipeline(username:str, limit:int, rag: RagStore | None = None) -> FrontEndReady:
     """main pipeline using scraped x data"""
+    return await collect(materialized(X, "X", "X", username, lambda: read_tweets(username, limit), rag))
 
-    # 1. Fetch Post Data
-    try:
-        raw_posts:list[RawPost] = get_tweets(username, limit)   ### TODO: Wait for Andrew X Scraper Functions
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.SCRAPER_FAIL),
-            f"Truth Social scraping failed for {username}",
-            {"platform": "X", "username": username, "error": str(e)}
-        )
-
-    # 2. Batch process for sentiment
-    try:
-        sentiment_posts:list[PostSentiment] = get_sentiment_batch(raw_posts)
-        sentiment_posts = [
-            post for post in sentiment_posts
-            if post.sentiment.positive >= 0.33 or post.sentiment.negative >= 0.33
-        ]
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.SENTIMENT_FAIL),
-            f"Sentiment analysis failed for {username}",
-            {"platform": "X", "username": username, "error": str(e)}
-        )
-    
-    # 3. Perform entity retrieval
-    try:
-        entity_posts:list[PostEntity] = build_all(sentiment_posts)
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.ENTITY_FAIL),
-            f"Entity retrieval failed for {username}",
-            {"platform": "X", "username": username, "error": str(e)}
-        )
-    
-    # 4. RAG Query
-    try:
-        entity_post_plus_rag:list[PostEntity] = append_rag_results(entity_posts, 3)
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.RAG_FAIL),
-            f"Entity retrieval augmented generation failed for {username}",
-            {"platform": "X", "username": username, "error": str(e)}
-        )
-    
-    # 5. Perform Financial analysis
-    try:
-        post_processed:FrontEndReady = process_posts(entity_post_plus_rag)
-    except Exception as e:
-        raise HarkonnenException(
-            500,
-            str(ErrorCodes.FINANCE_FAIL),
-            f"Financial Analysis Failed for  {username}",
-            {"platform": "X", "username": username, "error": str(e)}
-        )
-    
-    return post_processed
+
+async def truth_social_stream(username:str, limit: int, rag: RagStore | None = None) -> AsyncIterator[dict]:
+    """streaming pipeline using truth social data"""
+    return await stream(materialized(TRUTH_SOCIAL, "truth_social", "Truth Social", username, lambda: read_truth_social(username, limit), rag))
+
+
+async def x_stream(username:str, limit:int, rag: RagStore | None = None) -> AsyncIterator[dict]:
+    """streaming pipeline using scraped x data"""
+    return await stream(materialized(X, "X", "X", username, lambda: read_tweets(username, limit), rag))
 
 
+def influencer_scores(source: str, username: str) -> InfluencerScores:
+    """All-time scores from the running per-influencer totals"""
+    one_day_hits, seven_day_hits, ticker_count, posts = get_shared_result_store().totals(source, username)
+    one_day_influence_score, seven_day_influence_score = _scores(one_day_hits, seven_day_hits, ticker_count)
+    return InfluencerScores(
+        one_day_influence_score=one_day_influence_score,
+        seven_day_influence_score=seven_day_influence_score,
+        posts=posts,
+        tickers=ticker_count
+    )
@@ -0,0 +1,104 @@
+"""
+    Staged pipeline with bounded queues for Harkonnen
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+from app.nlp.stage_runner import StageRunner
+
+
+@dataclass
+class Stage:
+    """One step of a pipeline: an async function from one batch to the next (None drops the batch)"""
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+
+
+@dataclass
+class _Failed:
+    error: BaseException
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """Source → stage → ... → stage, one task per stage connected by bounded queues
+
+    Every stage works on its own batch at the same time (FinBERT scores batch
+    N+1 while market data is fetched for batch N), and at most queue_size
+    batches wait between two stages, so memory does not grow with the number
+    of posts. Batches come out in source order. The first error raised by the
+    source or a stage is re-raised to the consumer and the other tasks are
+    cancelled.
+    """
+
+    def __init__(self, stages: list[Stage], queue_size: int = 2):
+        self.stages = stages
+        self.queue_size = queue_size
+
+
+    async def run(self, source: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        queues = [asyncio.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        async def feed(out: asyncio.Queue):
+            try:
+                async for batch in source:
+                    await out.put(batch)
+            except Exception as e:
+                await out.put(_Failed(e))
+                return
+            await out.put(_DONE)
+
+        async def work(stage: Stage, inq: asyncio.Queue, out: asyncio.Queue):
+            while True:
+                batch = await inq.get()
+                if batch is _DONE or isinstance(batch, _Failed):
+                    await out.put(batch)
+                    return
+                try:
+                    result = await stage.fn(batch)
+                except Exception as e:
+                    await out.put(_Failed(e))
+                    return
+                if result is not None:
+                    await out.put(result)
+
+        tasks = [asyncio.create_task(feed(queues[0]), name="pipeline-source")]
+        for stage, inq, out in zip(self.stages, queues, queues[1:]):
+            tasks.append(asyncio.create_task(work(stage, inq, out), name=f"pipeline-{stage.name}"))
+
+        try:
+            while True:
+                batch = await queues[-1].get()
+                if batch is _DONE:
+                    return
+                if isinstance(batch, _Failed):
+                    raise batch.error
+                yield batch
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def blocking_source(runner: StageRunner, stage: str, batches: Iterator[Any]) -> AsyncIterator[Any]:
+    """Drive a blocking batch generator (file / database reads) on the runner's I/O pool"""
+    while True:
+        batch = await runner.io(stage, next, batches, _DONE)
+        if batch is _DONE:
+            return
+        yield batch
+
+
+def chunked(items, size: int) -> Iterator[list]:
+    """Lazily group an iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
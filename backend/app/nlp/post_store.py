@@ -0,0 +1,227 @@
+"""
+    Local post store for Harkonnen
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from app.core.config import settings
+from app.models.models import RawPost
+
+TRUTH_SOCIAL = "truth_social"
+X = "x"
+
+TRUTH_SOCIAL_JSON = "trump_posts_500.json"
+TWITTER_JSON_DIR = "app/data/twitter_scraper"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    platform  TEXT    NOT NULL,
+    post_id   TEXT    NOT NULL,
+    handle    TEXT    NOT NULL,   -- lowercased username, the lookup key
+    username  TEXT    NOT NULL,
+    timestamp INTEGER NOT NULL,   -- UTC microseconds
+    content   TEXT    NOT NULL,
+    PRIMARY KEY (platform, post_id)
+);
+CREATE INDEX IF NOT EXISTS posts_by_user ON posts (platform, handle, timestamp);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    platform  TEXT    NOT NULL,
+    handle    TEXT    NOT NULL,
+    since_id  TEXT    NOT NULL,   -- newest post id ingested
+    timestamp INTEGER NOT NULL,   -- its UTC microseconds
+    PRIMARY KEY (platform, handle)
+);
+"""
+
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def to_micros(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1_000_000)
+
+
+def from_micros(us: int) -> datetime:
+    return datetime.fromtimestamp(us / 1_000_000, tz=timezone.utc)
+
+
+class PostStore:
+    """SQLite post table indexed by (platform, username, timestamp)
+
+    Reads are answered straight from the index ("latest N", "since T") and
+    stream rows as RawPosts, so no request parses a whole JSON export again.
+    Each query gets its own short-lived memory-mapped read connection, so
+    iterators can be consumed from any thread; writes share one connection.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._writer = sqlite3.connect(self.path, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        return conn
+
+
+    def add(self, platform: str, posts: Iterable[RawPost]) -> int:
+        """Insert posts not stored yet (by post_id), returns how many were new"""
+        rows = [
+            (platform, str(p.post_id), p.username.lower(), p.username, to_micros(p.timestamp), p.content)
+            for p in posts
+        ]
+        with self._write_lock:
+            before = self._writer.total_changes
+            self._writer.executemany("INSERT OR IGNORE INTO posts VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._writer.commit()
+            return self._writer.total_changes - before
+
+
+    def _query(self, sql: str, params: tuple) -> Iterator[RawPost]:
+        with closing(self._reader()) as conn:
+            for post_id, username, ts, content in conn.execute(sql, params):
+                yield RawPost(post_id=post_id, timestamp=from_micros(ts), username=username, content=content)
+
+
+    def latest(self, platform: str, username: str, n: int) -> Iterator[RawPost]:
+        """Newest n posts of a user, newest first"""
+        return self._query(
+            "SELECT post_id, username, timestamp, content FROM posts "
+            "WHERE platform = ? AND handle = ? ORDER BY timestamp DESC LIMIT ?",
+            (platform, username.lower(), n)
+        )
+
+
+    def since(self, platform: str, username: str, since: datetime) -> Iterator[RawPost]:
+        """Posts of a user at or after since, newest first"""
+        return self._query(
+            "SELECT post_id, username, timestamp, content FROM posts "
+            "WHERE platform = ? AND handle = ? AND timestamp >= ? ORDER BY timestamp DESC",
+            (platform, username.lower(), to_micros(since))
+        )
+
+
+    def checkpoint(self, platform: str, username: str) -> tuple[str, datetime] | None:
+        """High-water mark (newest post id, its timestamp) of an ingested account"""
+        with closing(self._reader()) as conn:
+            row = conn.execute(
+                "SELECT since_id, timestamp FROM checkpoints WHERE platform = ? AND handle = ?",
+                (platform, username.lower())
+            ).fetchone()
+        return (row[0], from_micros(row[1])) if row else None
+
+
+    def set_checkpoint(self, platform: str, username: str, since_id: str, timestamp: datetime) -> None:
+        with self._write_lock:
+            self._writer.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+                (platform, username.lower(), str(since_id), to_micros(timestamp))
+            )
+            self._writer.commit()
+
+
+    def count(self, platform: str | None = None) -> int:
+        with closing(self._reader()) as conn:
+            if platform is None:
+                return conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM posts WHERE platform = ?", (platform,)).fetchone()[0]
+
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+
+
+# ----- Importers for the existing JSON exports -----
+
+def read_truth_social_json(path: str | Path = TRUTH_SOCIAL_JSON) -> Iterator[RawPost]:
+    """Posts saved by truth_social.py: a list of RawPost dicts"""
+    with open(path, "r") as f:
+        raw_data = json.load(f)
+    for item in raw_data:
+        try:
+            yield RawPost(
+                post_id=item['post_id'],
+                timestamp=datetime.fromisoformat(item['timestamp']),
+                username=item['username'],
+                content=item['content']
+            )
+        except Exception as e:
+            logging.warning(f"Skipping post {item.get('post_id')} due to error: {e}")
+
+
+def read_twitter_json(path: str | Path) -> Iterator[RawPost]:
+    """One scraper export: {post_id: {content, author, date}}, posts without content or date are skipped"""
+    with open(path, "r") as f:
+        posts = json.load(f)
+    for post_id, post in posts.items():
+        if post.get("content") is None or post.get("date") is None:
+            continue
+        yield RawPost(
+            post_id=post_id,
+            timestamp=datetime.fromisoformat(post["date"].replace("Z", "+00:00")),
+            username=post["author"],
+            content=post["content"]
+        )
+
+
+def import_json(store: PostStore, truth_social_file: str | Path = TRUTH_SOCIAL_JSON, twitter_dir: str | Path = TWITTER_JSON_DIR) -> int:
+    """Load the JSON exports into the store, returns the number of new posts"""
+    added = 0
+    if Path(truth_social_file).exists():
+        added += store.add(TRUTH_SOCIAL, read_truth_social_json(truth_social_file))
+    for path in sorted(Path(twitter_dir).glob("*.json")):
+        try:
+            added += store.add(X, read_twitter_json(path))
+        except Exception as e:
+            logging.warning(f"Skipping {path} due to error: {e}")
+    return added
+
+
+# ----- Shared store -----
+
+_shared_store: PostStore | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_post_store() -> PostStore:
+    """Return the process-wide PostStore, importing the JSON exports on first creation."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            fresh = not Path(settings.POST_STORE_PATH).exists()
+            _shared_store = PostStore(settings.POST_STORE_PATH)
+            if fresh:
+                added = import_json(_shared_store)
+                logging.info(f"Imported {added} posts into {settings.POST_STORE_PATH}")
+        return _shared_store
+
+
+def close_shared_post_store() -> None:
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is not None:
+            _shared_store.close()
+            _shared_store = None
+
+
+if __name__ == "__main__":
+    # python -m app.nlp.post_store [truth_social.json] [twitter_dir]
+    import sys
+    store = PostStore(settings.POST_STORE_PATH)
+    added = import_json(store, *sys.argv[1:3])
+    print(f"Imported {added} new posts into {settings.POST_STORE_PATH} ({store.count()} total)")
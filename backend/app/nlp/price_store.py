@@ -0,0 +1,297 @@
+"""
+    Local OHLCV store with incremental gap filling
+
+    Layout: <root>/<interval>/<TICKER>/
+        index.npy      int64 UTC ns bar timestamps, sorted
+        ohlcv.npy      float64 (n, 5) Open/High/Low/Close/Volume
+        coverage.json  [[start_ns, end_ns], ...] ranges already asked from the provider
+        empty.json     [[start_ns, end_ns, expires_ns], ...] ranges the provider answered with no bars
+"""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.nlp.market_data import (
+    OHLCV, PriceProvider, RangeKey, SeriesKey, merge_windows,
+    YFinanceProvider, RateLimitedProvider, TokenBucket
+)
+
+Span = Tuple[int, int]  # [start_ns, end_ns)
+FetchJob = Tuple[str, Span, Tuple[str, ...]]  # (interval, span, tickers)
+
+
+def missing_spans(coverage: List[Span], start: int, end: int) -> List[Span]:
+    """Parts of [start, end) not covered by the (merged, sorted) coverage list"""
+    gaps = []
+    cursor = start
+    for c_start, c_end in coverage:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class PriceStore:
+    """Memory-mapped per-ticker price history, only missing ranges are fetched from the provider
+
+    Fetch jobs of every caller share one pool of max_workers threads, so
+    max_workers bounds the requests in flight against the provider per process.
+    """
+
+    def __init__(self, root: str | Path, provider: PriceProvider, max_workers: int = 1, empty_ttl: float = 0.0):
+        self.root = Path(root)
+        self.provider = provider
+        self.max_workers = max(1, max_workers)
+        self.empty_ttl = empty_ttl  # seconds an empty answer keeps a span from being fetched again
+        self._locks: Dict[SeriesKey, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+
+    def _dir(self, ticker: str, interval: str) -> Path:
+        return self.root / interval / ticker.replace("/", "_")
+
+
+    def _lock(self, key: SeriesKey) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[key]
+
+
+    def _load(self, ticker: str, interval: str) -> Tuple[np.ndarray, np.ndarray, List[Span]]:
+        """Consistent (index, values, coverage) snapshot, taken under the series lock so no write lands in between"""
+        with self._lock((ticker, interval)):
+            return self._read_files(ticker, interval)
+
+
+    def _read_files(self, ticker: str, interval: str) -> Tuple[np.ndarray, np.ndarray, List[Span]]:
+        """Map the three series files, the caller holds the series lock (the mapped files stay valid after a replace)"""
+        path = self._dir(ticker, interval)
+        try:
+            index = np.load(path / "index.npy", mmap_mode="r")
+            values = np.load(path / "ohlcv.npy", mmap_mode="r")
+            with open(path / "coverage.json") as f:
+                coverage = [tuple(span) for span in json.load(f)]
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(OHLCV))), []
+        return index, values, coverage
+
+
+    def _load_empty(self, ticker: str, interval: str) -> List[Tuple[int, int, int]]:
+        """Unexpired negative-cache spans (start_ns, end_ns, expires_ns)"""
+        try:
+            with open(self._dir(ticker, interval) / "empty.json") as f:
+                spans = [tuple(span) for span in json.load(f)]
+        except FileNotFoundError:
+            return []
+        now = time.time_ns()
+        return [span for span in spans if span[2] > now]
+
+
+    def _mark_empty(self, ticker: str, interval: str, span: Span) -> None:
+        """Remember that the provider had no bars for span (delisted / unknown ticker, no trading)"""
+        if self.empty_ttl <= 0:
+            return
+        with self._lock((ticker, interval)):
+            spans = self._load_empty(ticker, interval)
+            spans.append((span[0], span[1], time.time_ns() + int(self.empty_ttl * 1e9)))
+            path = self._dir(ticker, interval)
+            path.mkdir(parents=True, exist_ok=True)
+            tmp = path / f".empty.json.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump([list(s) for s in spans], f)
+            os.replace(tmp, path / "empty.json")
+
+
+    def _write(self, ticker: str, interval: str, index: np.ndarray, values: np.ndarray, coverage: List[Span]) -> None:
+        """Atomically replace the stored arrays (write to temp files, then rename)"""
+        path = self._dir(ticker, interval)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, array in (("index.npy", index), ("ohlcv.npy", values)):
+            tmp = path / f".{name}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, path / name)
+        tmp = path / f".coverage.json.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump([list(span) for span in coverage], f)
+        os.replace(tmp, path / "coverage.json")
+
+
+    def _append(self, ticker: str, interval: str, frame: pd.DataFrame, spans: List[Span]) -> None:
+        """Merge fetched bars into the store and compact (sorted, one row per timestamp)"""
+        with self._lock((ticker, interval)):
+            index, values, coverage = self._read_files(ticker, interval)
+            new_index = frame.index.as_unit("ns").asi8 if not frame.empty else np.empty(0, dtype=np.int64)
+            new_values = frame.reindex(columns=OHLCV).to_numpy(dtype=np.float64) if not frame.empty else np.empty((0, len(OHLCV)))
+
+            all_index = np.concatenate([new_index, np.asarray(index)])
+            all_values = np.concatenate([new_values, np.asarray(values)])
+            # fresh bars first so np.unique keeps them over older copies
+            all_index, first = np.unique(all_index, return_index=True)
+            all_values = all_values[first]
+
+            coverage = merge_windows(coverage + spans)
+            self._write(ticker, interval, all_index, all_values, coverage)
+
+
+    def missing(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> List[FetchJob]:
+        """Fetch jobs needed to cover [start, end), tickers missing the exact same span share a job"""
+        start_ns = pd.Timestamp(start).value
+        # bars newer than "now" may still change, never mark them as covered
+        end_ns = min(pd.Timestamp(end).value, pd.Timestamp.now(tz="UTC").value)
+        if end_ns <= start_ns:
+            return []
+
+        by_gap: Dict[Span, List[str]] = defaultdict(list)
+        for ticker in tickers:
+            _, _, coverage = self._load(ticker, interval)
+            empty = [(s, e) for s, e, _ in self._load_empty(ticker, interval)]
+            if empty:
+                coverage = merge_windows(coverage + empty)
+            for gap in missing_spans(coverage, start_ns, end_ns):
+                by_gap[gap].append(ticker)
+        return [(interval, gap, tuple(gap_tickers)) for gap, gap_tickers in by_gap.items()]
+
+
+    def run(self, job: FetchJob) -> None:
+        """Fetch one job from the provider and merge the result into the store
+
+        A provider error raises and leaves the span uncovered (retried next
+        time). An answer without bars is negative-cached for empty_ttl so
+        delisted or unknown tickers do not drain the rate limit on every request.
+        """
+        interval, (gap_start, gap_end), tickers = job
+        frames = self.provider.fetch(
+            list(tickers), interval,
+            pd.Timestamp(gap_start, tz="UTC"), pd.Timestamp(gap_end, tz="UTC")
+        )
+        for ticker in tickers:
+            frame = frames.get(ticker)
+            if frame is None or frame.empty:
+                logging.warning(f"No data found for ticker {ticker}")
+                self._mark_empty(ticker, interval, (gap_start, gap_end))
+                continue
+            self._append(ticker, interval, frame, [(gap_start, gap_end)])
+
+
+    def ensure(self, tickers: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> None:
+        """Fetch whatever part of [start, end) is not stored yet for each ticker"""
+        self.run_all(self.missing(tickers, interval, start, end))
+
+
+    def _fetch_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="price-fetch")
+            return self._pool
+
+
+    def run_all(self, jobs: List[FetchJob]) -> None:
+        """Run fetch jobs on the shared bounded pool, a failed job only loses its own tickers"""
+        jobs = list(dict.fromkeys(jobs))
+        if not jobs:
+            return
+        pool = self._fetch_pool()
+        futures = {pool.submit(self.run, job): job for job in jobs}
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                interval, _, tickers = futures[fut]
+                logging.warning(f"Fetching {list(tickers)} {interval} failed: {e}")
+
+
+    def close(self):
+        """Stop the fetch pool once the jobs already submitted are done"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+    def read(self, ticker: str, interval: str, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> pd.DataFrame:
+        """Stored OHLCV bars in [start, end) as a UTC-indexed DataFrame"""
+        index, values, _ = self._load(ticker, interval)
+        lo = np.searchsorted(index, pd.Timestamp(start).value) if start is not None else 0
+        hi = np.searchsorted(index, pd.Timestamp(end).value) if end is not None else len(index)
+        return pd.DataFrame(
+            np.asarray(values[lo:hi]),
+            index=pd.DatetimeIndex(np.asarray(index[lo:hi]), tz="UTC"),
+            columns=OHLCV
+        )
+
+
+    def closes_for(self, plan: Dict[RangeKey, List[str]]) -> Dict[SeriesKey, pd.Series]:
+        """Run a fetch plan through the store and return stitched close series per (ticker, interval)"""
+        # 1. Fetch every missing span of the plan concurrently
+        jobs = []
+        for (interval, start, end), tickers in plan.items():
+            jobs.extend(self.missing(tickers, interval, start, end))
+        self.run_all(jobs)
+
+        # 2. Read back from the store
+        pieces: Dict[SeriesKey, List[pd.Series]] = defaultdict(list)
+        for (interval, start, end), tickers in plan.items():
+            for ticker in tickers:
+                close = self.read(ticker, interval, start, end)["Close"]
+                if not close.empty:
+                    pieces[(ticker, interval)].append(close)
+
+        series = {}
+        for key, parts in pieces.items():
+            close = pd.concat(parts).sort_index()
+            series[key] = close[~close.index.duplicated(keep="first")]
+        return series
+
+
+# ----- Shared store -----
+
+_shared_store: PriceStore | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_price_store() -> PriceStore:
+    """Return the process-wide PriceStore backed by rate-limited Yahoo Finance."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            provider = RateLimitedProvider(
+                YFinanceProvider(settings.MARKET_DATA_TIMEOUT),
+                TokenBucket(settings.MARKET_DATA_RATE, settings.MARKET_DATA_BURST),
+                settings.MARKET_DATA_RETRIES,
+                settings.MARKET_DATA_BACKOFF
+            )
+            _shared_store = PriceStore(
+                settings.PRICE_STORE_DIR, provider, settings.MARKET_DATA_MAX_WORKERS, settings.MARKET_DATA_EMPTY_TTL
+            )
+        return _shared_store
+
+
+def close_shared_price_store() -> None:
+    """Stop the shared fetch pool (application shutdown)."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is not None:
+            _shared_store.close()
+            _shared_store = None
@@ -1,11 +1,21 @@
 """
-Harkonnen's local RAG database for semantic search 
+Harkonnen's local RAG database for semantic search
+
+usage (from backend/): python -m app.nlp.rag.build_rag [--index flat|hnsw|ivfpq] [--recall-k 10] [--refresh]
 """
 
-import pandas as pd
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-import faiss, numpy as np, sqlite3, yfinance as yf
+
+import faiss, numpy as np, pandas as pd
+
+from app.core.config import settings
+from app.nlp.market_data import TokenBucket
+from app.nlp.rag.query_rag import EMBEDDING_MODEL, INDEX_FILE, META_FILE, TICKER_FILE
 
 # BASE_DIR points to: backend/app/nlp/rag
 BASE_DIR = Path(__file__).resolve().parent
@@ -13,62 +23,268 @@ BASE_DIR = Path(__file__).resolve().parent
 # RAG_DIR = BASE_DIR (no nested rag folder)
 RAG_DIR = BASE_DIR
 
-INDEX_FILE = RAG_DIR / "ticker_vectors.faiss"
-META_FILE = RAG_DIR / "companies.sqlite"
 TICKER_DF = RAG_DIR / "tickers.csv"
+CACHE_FILE = RAG_DIR / "rag_cache.sqlite"   # fetched descriptions + embeddings, reused across rebuilds
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+FLAT = "flat"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+INDEX_TYPES = (FLAT, HNSW, IVFPQ)
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    ticker      TEXT    PRIMARY KEY,
+    description TEXT    NOT NULL,
+    fetched_at  INTEGER NOT NULL    -- unix seconds
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    key    BLOB PRIMARY KEY,        -- sha256(model + description)
+    vector BLOB NOT NULL            -- L2-normalized float32
+);
+"""
 
 
 def fetch_company_desc(ticker: str) -> str:
     """Fetch long business description using yfinance"""
+    import yfinance as yf
     t = yf.Ticker(ticker)
     info = t.info
     return info.get("longBusinessSummary", "")
 
 
-def build():
-    """Build the FAISS + SQLite RAG database"""
-    RAG_DIR.mkdir(exist_ok=True)
+def content_key(model_id: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).digest()
 
-    df = pd.read_csv(TICKER_DF)
-    tickers = df["Symbol"].tolist()
 
-    descriptions = []
-    for t in tickers:
+class BuildCache:
+    """Descriptions by ticker and embeddings by content hash, so a rebuild only fetches / encodes what changed"""
+
+    def __init__(self, path: str | Path = CACHE_FILE):
+        self.conn = sqlite3.connect(str(path))
+        self.conn.executescript(CACHE_SCHEMA)
+        self.conn.commit()
+
+
+    def descriptions(self, tickers: list[str]) -> dict[str, str]:
+        cached = {}
+        for i in range(0, len(tickers), 500):
+            chunk = tickers[i:i + 500]
+            cached.update(self.conn.execute(
+                f"SELECT ticker, description FROM descriptions WHERE ticker IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return cached
+
+
+    def store_descriptions(self, descriptions: dict[str, str]) -> None:
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?)",
+                [(ticker, desc, now) for ticker, desc in descriptions.items()]
+            )
+
+
+    def embeddings(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        cached = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            cached.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return cached
+
+
+    def store_embeddings(self, vectors: dict[bytes, np.ndarray]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, np.ascontiguousarray(vec, dtype=np.float32).tobytes()) for key, vec in vectors.items()]
+            )
+
+
+    def close(self):
+        self.conn.close()
+
+
+def seed_descriptions(cache: BuildCache, meta_file: Path = META_FILE) -> int:
+    """Take over the descriptions of an existing companies table, so the first cached build only fetches the missing ones"""
+    if not meta_file.exists():
+        return 0
+    conn = sqlite3.connect(f"file:{meta_file}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT ticker, description FROM companies WHERE description != ''").fetchall()
+    finally:
+        conn.close()
+    known = cache.descriptions([ticker for ticker, _ in rows])
+    new = {ticker: desc for ticker, desc in rows if ticker not in known}
+    cache.store_descriptions(new)
+    return len(new)
+
+
+def fetch_descriptions(tickers: list[str], cache: BuildCache, refresh: bool = False, workers: int = 8) -> list[str]:
+    """Descriptions in ticker order, only uncached (or all, with refresh) tickers are fetched, rate limited"""
+    cached = {} if refresh else cache.descriptions(tickers)
+    missing = [t for t in tickers if t not in cached]
+    bucket = TokenBucket(settings.MARKET_DATA_RATE, settings.MARKET_DATA_BURST)
+
+    def fetch(ticker):
+        bucket.acquire()
         try:
-            print(f"fetching {t}")
-            desc = fetch_company_desc(t)
+            return fetch_company_desc(ticker)
         except Exception as e:
-            print(f"Error fetching description for {t}: {e}")
-            desc = ""  # fallback value
+            # not cached, so the next rebuild tries again
+            print(f"Error fetching description for {ticker}: {e}")
+            return None
+
+    fetched = {}
+    if missing:
+        print(f"fetching {len(missing)} descriptions ({len(tickers) - len(missing)} cached)")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for ticker, desc in zip(missing, pool.map(fetch, missing)):
+                if desc is not None:
+                    fetched[ticker] = desc
+        cache.store_descriptions(fetched)
+
+    return [fetched.get(t, cached.get(t, "")) for t in tickers]
+
+
+def embed(descriptions: list[str], cache: BuildCache, model=None, model_id: str = EMBEDDING_MODEL) -> np.ndarray:
+    """L2-normalized embeddings in input order, only texts without a cached vector are encoded"""
+    keys = [content_key(model_id, d) for d in descriptions]
+    cached = cache.embeddings(list(dict.fromkeys(keys)))
 
-        descriptions.append(desc)
+    # 1. Encode every distinct uncached text once
+    todo = {key: desc for key, desc in zip(keys, descriptions) if key not in cached}
+    print(f"encoding {len(todo)} descriptions ({len(descriptions) - len(todo)} cached)")
+    if todo:
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_id)
+        vectors = model.encode(list(todo.values()), convert_to_numpy=True).astype(np.float32)
+        faiss.normalize_L2(vectors)
+        new = dict(zip(todo.keys(), vectors))
+        cache.store_embeddings(new)
+        cached.update(new)
 
-    # --- Build FAISS index ---
-    vectors = model.encode(descriptions, convert_to_numpy=True)
-    faiss.normalize_L2(vectors)
+    # 2. Row i is ticker i
+    return np.stack([cached[key] for key in keys]).astype(np.float32)
 
-    index = faiss.IndexFlatIP(vectors.shape[1])
+
+def make_index(kind: str, vectors: np.ndarray, hnsw_m: int = 32, ef_search: int = 64, nprobe: int = 0) -> faiss.Index:
+    """Inner-product (cosine) index over normalized vectors, search parameters are saved with the index"""
+    n, d = vectors.shape
+    if kind == FLAT:
+        index = faiss.IndexFlatIP(d)
+    elif kind == HNSW:
+        index = faiss.IndexHNSWFlat(d, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(2 * hnsw_m, 200)
+        index.hnsw.efSearch = ef_search
+    elif kind == IVFPQ:
+        # ~4·sqrt(n) lists but at least 39 training points per list, 8-dim sub-vectors,
+        # and no more PQ centroids than there are vectors to train them on
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+        m = max(x for x in range(1, d // 8 + 1) if d % x == 0)
+        nbits = int(max(1, min(8, np.log2(max(n, 2)) - 1)))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(d), d, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(nlist, nprobe or max(1, nlist // 4))
+    else:
+        raise ValueError(f"unknown index type {kind!r}, expected one of {INDEX_TYPES}")
     index.add(vectors)
+    return index
+
+
+def recall_at_k(index: faiss.Index, exact: faiss.Index, queries: np.ndarray, k: int) -> tuple[float, float]:
+    """(recall@k of index against exact search, index search ms per query)"""
+    k = min(k, exact.ntotal)
+    _, truth = exact.search(queries, k)
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+    hits = sum(len(set(t) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / (len(queries) * k), ms
+
+
+def write_atomic(path: Path, write) -> None:
+    """Write through a temp file in the same directory, readers only ever see the old or the new file"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
 
-    faiss.write_index(index, str(INDEX_FILE))
+def write_metadata(path: Path, tickers: list[str], descriptions: list[str]) -> None:
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS companies (id INTEGER PRIMARY KEY, ticker TEXT, description TEXT)")
+        conn.executemany("INSERT INTO companies VALUES (?, ?, ?)", [(i, t, d) for i, (t, d) in enumerate(zip(tickers, descriptions))])
+        conn.commit()
+    finally:
+        conn.close()
 
-    # --- Build SQLite metadata ---
-    conn = sqlite3.connect(META_FILE)
-    c = conn.cursor()
-    c.execute(
-        "CREATE TABLE IF NOT EXISTS companies (id INTEGER PRIMARY KEY, ticker TEXT, description TEXT)"
-    )
 
-    for i, (tic, desc) in enumerate(zip(tickers, descriptions)):
-        c.execute("INSERT INTO companies VALUES (?, ?, ?)", (i, tic, desc))
+def write_tickers(path: Path, tickers: list[str]) -> None:
+    """Fixed-width id-indexed ticker array, memory-mapped by RagStore"""
+    with open(path, "wb") as f:
+        np.save(f, np.array(tickers, dtype=str))
 
-    conn.commit()
-    conn.close()
+
+def build(kind: str = FLAT, recall_k: int = 10, queries: int = 500, refresh: bool = False, workers: int = 8,
+          hnsw_m: int = 32, ef_search: int = 64, nprobe: int = 0, model=None) -> dict:
+    """Build the FAISS + SQLite RAG database"""
+    RAG_DIR.mkdir(exist_ok=True)
+
+    df = pd.read_csv(TICKER_DF)
+    tickers = df["Symbol"].tolist()
+
+    # 1. Descriptions and vectors, from the cache where possible
+    cache = BuildCache()
+    try:
+        if not refresh:
+            seed_descriptions(cache)
+        descriptions = fetch_descriptions(tickers, cache, refresh, workers)
+        vectors = embed(descriptions, cache, model)
+    finally:
+        cache.close()
+
+    # 2. Requested index, checked against exact search
+    start = time.perf_counter()
+    index = make_index(kind, vectors, hnsw_m, ef_search, nprobe)
+    build_s = time.perf_counter() - start
+
+    report = {"index": kind, "vectors": index.ntotal, "build_s": build_s}
+    if recall_k > 0:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+        exact = index if kind == FLAT else make_index(FLAT, vectors)
+        report[f"recall@{recall_k}"], report["ms_per_query"] = recall_at_k(index, exact, sample, recall_k)
+
+    # 3. Metadata first, the index last: a new index file means the build is complete
+    write_atomic(META_FILE, lambda tmp: write_metadata(tmp, tickers, descriptions))
+    write_atomic(TICKER_FILE, lambda tmp: write_tickers(tmp, tickers))
+    write_atomic(INDEX_FILE, lambda tmp: faiss.write_index(index, str(tmp)))
 
     print("RAG build complete.")
+    return report
 
 
 if __name__ == "__main__":
-    build()
+    import argparse
+    ap = argparse.ArgumentParser(description="Rebuild the ticker RAG index and metadata")
+    ap.add_argument("--index", choices=INDEX_TYPES, default=FLAT)
+    ap.add_argument("--recall-k", type=int, default=10, help="report recall@k against exact search, 0 to skip")
+    ap.add_argument("--queries", type=int, default=500, help="description vectors sampled as recall queries")
+    ap.add_argument("--refresh", action="store_true", help="refetch every description instead of using the cache")
+    ap.add_argument("--workers", type=int, default=8, help="concurrent description fetches")
+    ap.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    ap.add_argument("--ef-search", type=int, default=64, help="HNSW search breadth")
+    ap.add_argument("--nprobe", type=int, default=0, help="IVF lists searched, 0 = a quarter of them")
+    args = ap.parse_args()
+
+    report = build(args.index, args.recall_k, args.queries, args.refresh, args.workers, args.hnsw_m, args.ef_search, args.nprobe)
+    for key, value in report.items():
+        print(f"{key:>14}: {value:.4f}" if isinstance(value, float) else f"{key:>14}: {value}")
+    print(f"Reload a running server with: POST {settings.API_PREFIX}/rag/reload")
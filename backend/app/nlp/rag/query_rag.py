@@ -1,53 +1,238 @@
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-import faiss
+import logging
 import numpy as np
 import sqlite3
+import threading
+
+from app.core.config import settings
+from app.nlp.registry import registry, READY
+
+BASE_DIR = Path(__file__).resolve().parent
+INDEX_FILE = BASE_DIR / "ticker_vectors.faiss"
+META_FILE = BASE_DIR / "companies.sqlite"
+TICKER_FILE = BASE_DIR / "ticker_ids.npy"   # id-indexed tickers ("" = no row), written by build_rag
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def load_index():
+    import faiss
+    if not settings.RAG_INDEX_MMAP:
+        return faiss.read_index(str(INDEX_FILE))
+
+    # Vectors / codes stay in the file: every worker maps the same page-cache pages
+    # instead of a private copy. build_rag replaces the file, never rewrites it, so a
+    # mapped index stays valid until the store is swapped.
+    try:
+        return faiss.read_index(str(INDEX_FILE), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        logging.warning(f"Could not memory-map {INDEX_FILE}, reading it into memory: {e}")
+        return faiss.read_index(str(INDEX_FILE))
+
+
+def load_tickers() -> np.ndarray | None:
+    """Memory-mapped ticker table, None when build_rag has not written one"""
+    if not TICKER_FILE.exists():
+        return None
+    return np.load(TICKER_FILE, mmap_mode="r")
+
+
+def load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
 
 
 class RagStore:
-    def __init__(self, base_dir: Path | None = None):
+    def __init__(self, base_dir: Path | None = None, model=None, index=None):
          # Always load RAG files from this directory
-        self.base = Path(__file__).resolve().parent
+        self.base = BASE_DIR
+        self.db_path = META_FILE
 
         # Load FAISS index
-        self.index = faiss.read_index(str(self.base / "ticker_vectors.faiss"))
+        self.index = index if index is not None else load_index()
 
         # Load embedding model
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.model = model if model is not None else load_embedding_model()
+
+        # SQLite metadata, one read-only connection per thread
+        self._local = threading.local()
+        self._conns: list[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+
+        # Id-indexed ticker table ("" = no metadata), descriptions are only read when asked for
+        self.tickers = self._load_tickers()
+        self._descriptions: dict[int, str] = {}
+        self._desc_lock = threading.Lock()
 
-        # Load SQLite metadata
-        self.conn = sqlite3.connect(str(self.base / "companies.sqlite"))
-        self.cursor = self.conn.cursor()
+        # Searches running on this store, a store swapped out by a reload is closed once they are done
+        self._active = 0
+        self._retired = False
+        self._active_lock = threading.Lock()
 
 
-    def search(self, text: str, k: int = 5):
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """Read-only cursor owned by the calling thread."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            with self._conns_lock:
+                self._conns.append(conn)
+            cursor = self._local.cursor = conn.cursor()
+        return cursor
+
+
+    def _load_tickers(self) -> np.ndarray:
+        """Id-indexed ticker array, mapped from build_rag's ticker table or else read from the companies table."""
+        if settings.RAG_INDEX_MMAP:
+            tickers = load_tickers()
+            if tickers is not None and len(tickers) == self.index.ntotal:
+                return tickers
+
+        rows = self.cursor.execute("SELECT id, ticker FROM companies").fetchall()
+        size = max((row[0] for row in rows), default=-1) + 1
+        tickers = np.full(size, "", dtype=object)
+        for idx, ticker in rows:
+            tickers[idx] = ticker
+        return tickers.astype(str)
+
+
+    def descriptions(self, ids) -> dict[int, str]:
+        """Return descriptions for the given ids, reading uncached ones from SQLite."""
+        ids = {int(i) for i in ids}
+        missing = sorted(ids - self._descriptions.keys())
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            rows = self.cursor.execute(
+                f"SELECT id, description FROM companies WHERE id IN ({placeholders})",
+                missing
+            ).fetchall()
+            with self._desc_lock:
+                self._descriptions.update(rows)
+        return {i: self._descriptions.get(i, "") for i in ids}
+
+
+    def search(self, text: str, k: int = 5, include_description: bool = True):
         """Return top-k most semantically similar tickers."""
-        
-        # 1. Embed query
-        q_vec = self.model.encode([text], convert_to_numpy=True)
-        faiss.normalize_L2(q_vec)
-
-        # 2. FAISS cosine search
-        distances, indices = self.index.search(q_vec, k)
-
-        # 3. Map FAISS indices → tickers/descriptions
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            row = self.cursor.execute(
-                "SELECT ticker, description FROM companies WHERE id=?",
-                (int(idx),)
-            ).fetchone()
-
-            if row:
-                ticker, desc = row
-                results.append({
-                    "ticker": ticker,
+        return self.search_many([text], k, include_description)[0]
+
+
+    def search_many(self, texts: list[str], k: int = 5, include_description: bool = True) -> list[list[dict]]:
+        """Return top-k most semantically similar tickers for every text, in input order."""
+        if not texts:
+            return []
+
+        with self._active_lock:
+            self._active += 1
+        try:
+            return self._search_many(texts, k, include_description)
+        finally:
+            with self._active_lock:
+                self._active -= 1
+                if self._retired and self._active == 0:
+                    self.close()
+
+
+    def _search_many(self, texts: list[str], k: int, include_description: bool) -> list[list[dict]]:
+        import faiss
+
+        # 1. Embed all queries in one batched forward pass
+        q_vecs = self.model.encode(texts, convert_to_numpy=True)
+        faiss.normalize_L2(q_vecs)
+
+        # 2. Single FAISS cosine search over the whole query matrix
+        distances, indices = self.index.search(q_vecs, k)
+
+        # 3. Drop padding (-1) and ids without metadata, then map ids → tickers in memory
+        valid = (indices >= 0) & (indices < len(self.tickers))
+        tickers = np.asarray(self.tickers[np.where(valid, indices, 0)])
+        valid &= tickers != ""
+        tickers = np.where(valid, tickers, "")
+
+        descs = {}
+        if include_description:
+            descs = self.descriptions(indices[valid])
+
+        # 4. Build results per query
+        all_results = []
+        for row_idx, row_dist, row_tickers, row_valid in zip(indices, distances, tickers, valid):
+            results = []
+            for idx, dist, ticker, ok in zip(row_idx, row_dist, row_tickers, row_valid):
+                if not ok:
+                    continue
+                result = {
+                    "ticker": str(ticker),
                     "score": float(dist),     # cosine similarity
-                    "description": desc
-                })
+                }
+                if include_description:
+                    result["description"] = descs[int(idx)]
+                results.append(result)
+            all_results.append(results)
+
+        return all_results
+
+
+    def close(self):
+        """Close every per-thread SQLite connection opened by this store."""
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+
+
+    def retire(self):
+        """Close this store as soon as no search is running on it (it has been replaced)"""
+        with self._active_lock:
+            self._retired = True
+            if self._active == 0:
+                self.close()
+
+
+# ----- Shared store -----
+# One process-wide RagStore, built from the registry's MiniLM model and FAISS
+# index and handed to endpoints / pipelines instead of a fresh store per request.
+
+registry.register("minilm", load_embedding_model)
+registry.register("faiss_index", load_index)
+registry.register("rag_store", lambda: RagStore(model=registry.get("minilm"), index=registry.get("faiss_index")))
+
+
+def init_shared_store() -> RagStore:
+    """Create the process-wide RagStore if it does not exist yet."""
+    return registry.get("rag_store")
+
+
+def get_shared_store() -> RagStore:
+    """Return the process-wide RagStore, creating it lazily when needed."""
+    return registry.get("rag_store")
+
+
+def reload_shared_store() -> RagStore:
+    """Swap the shared store onto the index files last written by build_rag.
+
+    The new index and store are built next to the running ones and then
+    replaced in the registry, so searches already in flight finish on the old
+    store, which closes its SQLite connections once the last of them is done.
+    Its mapped index and ticker table go with the last reference to it.
+    """
+    index = load_index()
+    store = RagStore(model=registry.get("minilm"), index=index)
+    registry.replace("faiss_index", index)
+    old = registry.replace("rag_store", store)
+    if old is not None:
+        old.retire()
+    return store
+
+
+def close_shared_store() -> None:
+    """Release the process-wide RagStore (application shutdown)."""
+    if registry.status().get("rag_store") == READY:
+        registry.get("rag_store").close()
+        registry.unload("rag_store")
 
-        return results
 
 if __name__ == "__main__":
     rag = RagStore()
@@ -55,4 +240,4 @@ if __name__ == "__main__":
     results = rag.search("US exports are deteriorating amid China's tariffs on American Exports", k=5)
     for r in results:
         print(r)
-    
\ No newline at end of file
+
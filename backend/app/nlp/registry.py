@@ -0,0 +1,103 @@
+"""
+    Lazy model registry for Harkonnen
+
+    Heavy resources (FinBERT, MiniLM, the FAISS index, ...) register a loader here
+    instead of loading at import time. They are built on first use, or ahead of time
+    by warm_up() running in a background thread, and report their state for /ready.
+"""
+
+import logging
+import threading
+from typing import Any, Callable
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelRegistry:
+    """Process-wide, thread-safe, load-once model container"""
+
+    def __init__(self):
+        self._loaders: dict[str, Callable[[], Any]] = {}
+        self._models: dict[str, Any] = {}
+        self._status: dict[str, str] = {}
+        self._errors: dict[str, str] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, PENDING)
+
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use (concurrent callers wait for one load)"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            self._status[name] = LOADING
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._status[name] = FAILED
+                self._errors[name] = str(e)
+                raise
+            self._models[name] = model
+            self._status[name] = READY
+            self._errors.pop(name, None)
+            return model
+
+
+    def replace(self, name: str, model: Any) -> Any:
+        """Swap a loaded model for a new instance (e.g. a rebuilt index), returns the one it replaced"""
+        with self._locks[name]:
+            old = self._models.get(name)
+            self._models[name] = model
+            self._status[name] = READY
+            return old
+
+
+    def unload(self, name: str) -> None:
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._status[name] = PENDING
+
+
+    def warm_up(self, names: list[str] | None = None) -> threading.Thread:
+        """Load the given (default: all) models in a background thread"""
+        names = list(self._loaders) if names is None else names
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logging.error(f"Warm-up of {name} failed: {e}")
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+    def status(self) -> dict[str, str]:
+        return {
+            name: f"{FAILED}: {self._errors[name]}" if state == FAILED else state
+            for name, state in self._status.items()
+        }
+
+
+    @property
+    def ready(self) -> bool:
+        return all(state == READY for state in self._status.values())
+
+
+registry = ModelRegistry()
@@ -0,0 +1,170 @@
+"""
+    Materialized per-post pipeline results for Harkonnen
+"""
+
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from app.core.config import settings
+from app.models.models import PostProcessed
+from app.nlp.finance_processing import is_priced, post_time
+
+# Posts whose prices are still incomplete this long after posting are frozen anyway
+SETTLE_DAYS = 14
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    platform       TEXT    NOT NULL,
+    post_id        TEXT    NOT NULL,
+    handle         TEXT    NOT NULL,   -- lowercased influencer name
+    kept           INTEGER NOT NULL,   -- 0: filtered out as neutral, nothing else stored
+    final          INTEGER NOT NULL,   -- 1: immutable, never processed again
+    one_day_hits   INTEGER NOT NULL,
+    seven_day_hits INTEGER NOT NULL,
+    ticker_count   INTEGER NOT NULL,
+    post           TEXT,               -- PostProcessed JSON
+    PRIMARY KEY (platform, post_id)
+);
+CREATE TABLE IF NOT EXISTS influencer_totals (
+    platform       TEXT    NOT NULL,
+    handle         TEXT    NOT NULL,
+    one_day_hits   INTEGER NOT NULL,
+    seven_day_hits INTEGER NOT NULL,
+    ticker_count   INTEGER NOT NULL,
+    posts          INTEGER NOT NULL,
+    PRIMARY KEY (platform, handle)
+);
+"""
+
+
+@dataclass
+class StoredResult:
+    post_id: str
+    kept: bool
+    final: bool
+    one_day_hits: int = 0
+    seven_day_hits: int = 0
+    ticker_count: int = 0
+    post: PostProcessed | None = None
+
+
+def is_final(post: PostProcessed, now: datetime) -> bool:
+    """Sentiment, tickers and past price changes no longer change once the post is priced and settled"""
+    if not is_priced(post, now):
+        return False
+    return len(post.price_changes) == len(post.tickers) or (now - post_time(post)).days > SETTLE_DAYS
+
+
+class ResultStore:
+    """PostProcessed rows per post plus running prediction totals per influencer
+
+    Requests only send posts without a final row through the pipeline; the
+    influencer totals are adjusted by the difference whenever a row changes,
+    so they never have to be recomputed from the posts. Reads get their own
+    short-lived connection, so concurrent requests only queue behind writes.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+
+    def _reader(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+
+    def get(self, platform: str, post_ids: list[str]) -> dict[str, StoredResult]:
+        """Stored results for the given posts, keyed by post_id"""
+        out: dict[str, StoredResult] = {}
+        with closing(self._reader()) as conn:
+            for i in range(0, len(post_ids), 500):
+                chunk = post_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT post_id, kept, final, one_day_hits, seven_day_hits, ticker_count, post FROM processed "
+                    f"WHERE platform = ? AND post_id IN ({placeholders})",
+                    (platform, *chunk)
+                ).fetchall()
+                for post_id, kept, final, one_day, seven_day, tickers, post in rows:
+                    out[post_id] = StoredResult(
+                        post_id, bool(kept), bool(final), one_day, seven_day, tickers,
+                        PostProcessed.model_validate_json(post) if post else None
+                    )
+        return out
+
+
+    def put(self, platform: str, username: str, results: list[StoredResult]) -> None:
+        """Upsert results and move the influencer totals by each row's difference"""
+        handle = username.lower()
+        with self._lock, self._conn:
+            d_one = d_seven = d_tickers = d_posts = 0
+            for r in results:
+                old = self._conn.execute(
+                    "SELECT one_day_hits, seven_day_hits, ticker_count, kept FROM processed WHERE platform = ? AND post_id = ?",
+                    (platform, r.post_id)
+                ).fetchone() or (0, 0, 0, 0)
+                d_one += r.one_day_hits - old[0]
+                d_seven += r.seven_day_hits - old[1]
+                d_tickers += r.ticker_count - old[2]
+                d_posts += int(r.kept) - old[3]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (platform, r.post_id, handle, int(r.kept), int(r.final), r.one_day_hits, r.seven_day_hits,
+                     r.ticker_count, r.post.model_dump_json() if r.post is not None else None)
+                )
+            self._conn.execute(
+                "INSERT INTO influencer_totals VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (platform, handle) DO UPDATE SET "
+                "one_day_hits = one_day_hits + excluded.one_day_hits, "
+                "seven_day_hits = seven_day_hits + excluded.seven_day_hits, "
+                "ticker_count = ticker_count + excluded.ticker_count, "
+                "posts = posts + excluded.posts",
+                (platform, handle, d_one, d_seven, d_tickers, d_posts)
+            )
+
+
+    def totals(self, platform: str, username: str) -> tuple[int, int, int, int]:
+        """Running (1d hits, 7d hits, ticker count, posts) over every stored post of an influencer"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT one_day_hits, seven_day_hits, ticker_count, posts FROM influencer_totals WHERE platform = ? AND handle = ?",
+                (platform, username.lower())
+            ).fetchone()
+        return row or (0, 0, 0, 0)
+
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ----- Shared store -----
+
+_shared_store: ResultStore | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_result_store() -> ResultStore:
+    """Return the process-wide ResultStore."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = ResultStore(settings.RESULT_STORE_PATH)
+        return _shared_store
+
+
+def close_shared_result_store() -> None:
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is not None:
+            _shared_store.close()
+            _shared_store = None
@@ -2,17 +2,17 @@
     RAG Wrapper for Pipeline integration
 """
 
-from pathlib import Path
-from app.nlp.rag.query_rag import RagStore
+from app.nlp.rag.query_rag import RagStore, get_shared_store
 from app.models.models import PostEntity
 
-def append_rag_results(entity_posts:list[PostEntity], k:int) -> list[PostEntity]:
+def append_rag_results(entity_posts:list[PostEntity], k:int, rag: RagStore | None = None) -> list[PostEntity]:
     """Append tickers to Fuzzy Search"""
-    rag = RagStore(Path(__file__).resolve().parent)
+    if rag is None:
+        rag = get_shared_store()
 
-    for post in entity_posts:
-        results = rag.search(post.content, k)
-        # each result is: {"ticker": "...", "score": float, "description": "..."}
+    all_results = rag.search_many([post.content for post in entity_posts], k, include_description=False)
+    for post, results in zip(entity_posts, all_results):
+        # each result is: {"ticker": "...", "score": float}
         for r in results:
             if(r["ticker"] not in post.tickers):
                 post.tickers.append(r["ticker"])
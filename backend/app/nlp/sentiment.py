@@ -5,20 +5,143 @@
 
 """
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from scipy.special import softmax
 from app.models.models import RawPost, Sentiment, PostSentiment
+from app.core.config import settings
+from app.nlp.sentiment_cache import SentimentCache, normalize
+from app.nlp.registry import registry
+from app.nlp.sentiment_backends import TORCH, SentimentBackend, build_backend
+from app.nlp.sentiment_pool import SentimentPool, get_shared_pool
+from typing import Callable
 import numpy as np
 
-# Init Tokenizer + Model
-tok = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-mod = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+
+class SentimentEngine:
+    """Length-bucketed, micro-batched FinBERT inference on a pluggable backend"""
+
+    def __init__(self, tokenizer, backend: SentimentBackend, max_batch_tokens: int):
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+
+
+    def micro_batches(self, lengths: list[int]) -> list[list[int]]:
+        """Group indices sorted by token length so no batch exceeds max_batch_tokens once padded"""
+        batches: list[list[int]] = []
+        current: list[int] = []
+
+        for i in np.argsort(lengths, kind="stable"):
+            # sorted ascending, so the newest item is always the longest in its batch
+            if current and lengths[i] * (len(current) + 1) > self.max_batch_tokens:
+                batches.append(current)
+                current = []
+            current.append(int(i))
+
+        if current:
+            batches.append(current)
+        return batches
+
+
+    def predict(self, contents: list[str]) -> np.ndarray:
+        """Return (N, 3) positive/negative/neutral probabilities in input order"""
+        from scipy.special import softmax
+
+        probs = np.empty((len(contents), 3), dtype=np.float32)
+        if not contents:
+            return probs
+
+        # 1. Tokenize without padding so each post keeps its own length
+        encodings = self.tokenizer(contents, truncation=True)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+
+        # 2. Forward pass per micro-batch, padded only to the batch's longest post
+        for batch in self.micro_batches(lengths):
+            inputs = self.tokenizer.pad(
+                {key: [encodings[key][i] for i in batch] for key in encodings.keys()},
+                return_tensors="np"
+            )
+            logits = self.backend.logits(dict(inputs))
+
+            # 3. Scatter back into the original order
+            probs[batch] = softmax(logits, axis=1)
+
+        return probs
+
+
+# Tokenizer + Model are loaded on first use (or by the startup warm-up)
+MODEL_ID = "ProsusAI/finbert"
+
+
+def load_engine(backend: str | None = None, num_threads: int | None = None) -> SentimentEngine:
+    """FinBERT on the given backend, SENTIMENT_BACKEND / SENTIMENT_NUM_THREADS by default"""
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tok = AutoTokenizer.from_pretrained(MODEL_ID)
+    mod = AutoModelForSequenceClassification.from_pretrained(MODEL_ID)
+    backend = build_backend(
+        backend or settings.SENTIMENT_BACKEND, mod, tok, settings.SENTIMENT_ONNX_PATH,
+        settings.SENTIMENT_NUM_THREADS if num_threads is None else num_threads
+    )
+    return SentimentEngine(tok, backend, settings.SENTIMENT_MAX_BATCH_TOKENS)
+
+
+def load_scorer() -> SentimentEngine | SentimentPool:
+    """In-process engine, or the worker pool when SENTIMENT_WORKERS > 0 (the model then only lives in the workers)"""
+    if settings.SENTIMENT_WORKERS > 0:
+        return get_shared_pool()
+    return load_engine()
+
+
+def load_cache() -> SentimentCache:
+    # backends differ slightly, so each keeps its own cached probabilities
+    model_id = MODEL_ID if settings.SENTIMENT_BACKEND == TORCH else f"{MODEL_ID}:{settings.SENTIMENT_BACKEND}"
+    return SentimentCache(model_id, settings.SENTIMENT_CACHE_SIZE, settings.SENTIMENT_CACHE_PATH or None)
+
+
+registry.register("finbert", load_scorer)
+registry.register("sentiment_cache", load_cache)
+
+
+def get_engine() -> SentimentEngine | SentimentPool:
+    return registry.get("finbert")
+
+
+def get_cache() -> SentimentCache:
+    return registry.get("sentiment_cache")
+
+
+def score_cached(contents: list[str], engine: Callable[[], SentimentEngine | SentimentPool],
+                 cache: SentimentCache | None = None) -> np.ndarray:
+    """Return (N, 3) probabilities, only cache misses are sent through FinBERT
+
+    Each distinct missing text is scored once in its normalized form, the form
+    the cache is keyed by, so a post gets the same answer whichever path
+    (batcher or direct call) scored it first. engine is only resolved when
+    something misses.
+    """
+    if cache is not None:
+        probs, misses = cache.lookup(contents)
+    else:
+        probs, misses = np.zeros((len(contents), 3), dtype=np.float32), list(range(len(contents)))
+    if misses:
+        normalized = {i: normalize(contents[i]) for i in misses}
+        unique = list(dict.fromkeys(normalized.values()))
+        unique_probs = engine().predict(unique)
+        by_content = dict(zip(unique, unique_probs))
+        for i in misses:
+            probs[i] = by_content[normalized[i]]
+        if cache is not None:
+            cache.store(unique, unique_probs)
+    return probs
+
+
+def score_contents(contents: list[str]) -> np.ndarray:
+    """Return (N, 3) probabilities through the shared cache and scorer"""
+    return score_cached(contents, get_engine, get_cache())
+
 
 def get_sentiment(content:str) -> Sentiment:
     """Return sentiment object for a single post"""
-    inputs = tok(content, return_tensors="pt", truncation=True, padding=True)
-    logits = mod(**inputs).logits.detach().numpy()[0]
-    probs = softmax(logits)
+    probs = score_contents([content])[0]
 
     sent:Sentiment = Sentiment(
         positive = probs[0],
@@ -34,21 +157,11 @@ def get_sentiment_batch(posts: list[RawPost]) -> list[PostSentiment]:
     # 1. Extract all text contents
     contents = [p.content for p in posts]
 
-    # 2. Tokenize as a single batch
-    inputs = tok(
-        contents,
-        return_tensors="pt",
-        truncation=True,
-        padding=True
-    )
-
-    # 3. Single forward pass through FinBERT
-    logits = mod(**inputs).logits.detach().numpy()  # shape: (N, 3)
-
-    # 4. Softmax for each row
-    probs = softmax(logits, axis=1)
+    # 2. Cached lookups, misses go through FinBERT in length-bucketed micro-batches
+    #    (sharded across the worker processes when SENTIMENT_WORKERS > 0)
+    probs = score_contents(contents)  # shape: (N, 3)
 
-    # 5. Build output list
+    # 3. Build output list
     results: list[PostSentiment] = []
 
     for post, prob in zip(posts, probs):
@@ -0,0 +1,189 @@
+"""
+    Interchangeable FinBERT inference backends
+"""
+
+import inspect
+import logging
+import time
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+
+TORCH = "torch"
+TORCH_INT8 = "torch-int8"
+ONNX = "onnx"
+ONNX_INT8 = "onnx-int8"
+BACKENDS = (TORCH, TORCH_INT8, ONNX, ONNX_INT8)
+
+ONNX_OPSET = 17
+
+
+class SentimentBackend(Protocol):
+    """Runs padded token batches (numpy int64 arrays) through FinBERT and returns (N, 3) logits"""
+
+    name: str
+
+    def logits(self, inputs: dict[str, np.ndarray]) -> np.ndarray:
+        ...
+
+
+class TorchBackend:
+    """Full-precision PyTorch model, the reference every other backend is checked against"""
+
+    name = TORCH
+
+    def __init__(self, model, num_threads: int = 0):
+        import torch
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self.model = model.eval()
+
+
+    def logits(self, inputs: dict[str, np.ndarray]) -> np.ndarray:
+        import torch
+        with torch.inference_mode():
+            tensors = {key: torch.from_numpy(value) for key, value in inputs.items()}
+            return self.model(**tensors).logits.float().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch model with every nn.Linear dynamically quantized to int8 (weights int8, activations quantized per batch)"""
+
+    name = TORCH_INT8
+
+    def __init__(self, model, num_threads: int = 0):
+        import torch
+        quantized = torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized, num_threads)
+
+
+class OnnxBackend:
+    """Exported graph run by ONNX Runtime on the CPU execution provider"""
+
+    name = ONNX
+
+    def __init__(self, path: str | Path, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+
+    def logits(self, inputs: dict[str, np.ndarray]) -> np.ndarray:
+        feed = {name: inputs[name].astype(np.int64, copy=False) for name in self.input_names}
+        return self.session.run(None, feed)[0]
+
+
+def export_onnx(model, tokenizer, path: str | Path) -> Path:
+    """Export the classifier with dynamic batch and sequence axes"""
+    import torch
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 1. Trace with a tiny batch, every input the tokenizer produces becomes a graph input,
+    #    named in forward() signature order since that is the order the exporter emits them in
+    sample = tokenizer(["FinBERT export", "sample"], padding=True, return_tensors="pt")
+    names = [name for name in inspect.signature(model.forward).parameters if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["logits"] = {0: "batch"}
+
+    # 2. Write to a temp file first so a crashed export never leaves a half-written model behind
+    tmp = path.with_suffix(".tmp")
+    with torch.inference_mode():
+        torch.onnx.export(
+            model.eval(), ({name: sample[name] for name in names},), str(tmp),
+            input_names=names, output_names=["logits"], dynamic_axes=axes,
+            opset_version=ONNX_OPSET, dynamo=False
+        )
+    tmp.replace(path)
+    return path
+
+
+def quantize_onnx(source: str | Path, path: str | Path) -> Path:
+    """Dynamic int8 quantization of an exported graph (MatMul weights)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    quantize_dynamic(str(source), str(tmp), weight_type=QuantType.QInt8)
+    tmp.replace(path)
+    return path
+
+
+def onnx_paths(path: str | Path) -> tuple[Path, Path]:
+    """(fp32, int8) graph files, the int8 one sits next to the exported one"""
+    path = Path(path)
+    return path, path.with_name(path.stem + "-int8" + path.suffix)
+
+
+def build_backend(name: str, model, tokenizer, onnx_path: str | Path, num_threads: int = 0) -> SentimentBackend:
+    """Backend by name, exporting (and quantizing) the ONNX graph on first use"""
+    if name == TORCH:
+        return TorchBackend(model, num_threads)
+    if name == TORCH_INT8:
+        return QuantizedTorchBackend(model, num_threads)
+    if name in (ONNX, ONNX_INT8):
+        fp32, int8 = onnx_paths(onnx_path)
+        if not fp32.exists():
+            logging.info(f"Exporting FinBERT to {fp32}")
+            export_onnx(model, tokenizer, fp32)
+        if name == ONNX_INT8 and not int8.exists():
+            logging.info(f"Quantizing {fp32} to {int8}")
+            quantize_onnx(fp32, int8)
+        backend = OnnxBackend(int8 if name == ONNX_INT8 else fp32, num_threads)
+        backend.name = name
+        return backend
+    raise ValueError(f"unknown sentiment backend {name!r}, expected one of {BACKENDS}")
+
+
+def parity(reference, candidates: list, contents: list[str]) -> dict[str, dict]:
+    """Score contents with every engine and compare probabilities against the reference engine
+
+    Returns per backend: max and mean absolute probability deviation, the
+    share of posts whose argmax label agrees, and posts scored per second.
+    """
+    def timed(engine):
+        start = time.perf_counter()
+        probs = engine.predict(contents)
+        return probs, len(contents) / max(time.perf_counter() - start, 1e-9)
+
+    ref_probs, ref_rate = timed(reference)
+    report = {reference.backend.name: {"max_abs_diff": 0.0, "mean_abs_diff": 0.0, "label_agreement": 1.0, "posts_per_s": ref_rate}}
+    for engine in candidates:
+        probs, rate = timed(engine)
+        diff = np.abs(probs - ref_probs)
+        report[engine.backend.name] = {
+            "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+            "mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+            "label_agreement": float((probs.argmax(1) == ref_probs.argmax(1)).mean()) if len(diff) else 1.0,
+            "posts_per_s": rate
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # python -m app.nlp.sentiment_backends [--backends torch-int8 onnx onnx-int8] [--posts 256]
+    import argparse
+    from app.nlp.post_store import TRUTH_SOCIAL, get_shared_post_store
+    from app.nlp.sentiment import load_engine
+
+    ap = argparse.ArgumentParser(description="Compare sentiment backends against the torch reference")
+    ap.add_argument("--backends", nargs="+", default=[TORCH_INT8, ONNX, ONNX_INT8], choices=BACKENDS)
+    ap.add_argument("--posts", type=int, default=256, help="newest Truth Social posts to score")
+    ap.add_argument("--username", default="realDonaldTrump")
+    args = ap.parse_args()
+
+    contents = [p.content for p in get_shared_post_store().latest(TRUTH_SOCIAL, args.username, args.posts)]
+    report = parity(load_engine(TORCH), [load_engine(name) for name in args.backends], contents)
+
+    print(f"{len(contents)} posts")
+    print(f"{'backend':<12}{'max |dp|':>12}{'mean |dp|':>12}{'labels':>9}{'posts/s':>10}")
+    for name, row in report.items():
+        print(f"{name:<12}{row['max_abs_diff']:>12.2e}{row['mean_abs_diff']:>12.2e}"
+              f"{row['label_agreement']:>9.1%}{row['posts_per_s']:>10.1f}")
@@ -0,0 +1,137 @@
+"""
+    Cross-request dynamic batching for FinBERT sentiment
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from app.models.models import Sentiment
+from app.core.config import settings
+from app.nlp.sentiment import SentimentEngine, get_engine, get_cache, score_cached
+from app.nlp.sentiment_cache import SentimentCache
+
+
+class SentimentBatcher:
+    """Background worker that scores requests arriving within a short window as one batch"""
+
+    def __init__(self, engine: Callable[[], SentimentEngine], wait_ms: int, max_batch_size: int, cache: SentimentCache | None = None):
+        self.engine = engine   # resolved per batch, so the model can still be loading when the batcher starts
+        self.cache = cache
+        self.wait = wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: queue.Queue[tuple[str, Future] | None] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="sentiment-batcher", daemon=True)
+        self._worker.start()
+
+
+    def submit(self, content: str) -> Future:
+        """Queue one string, the returned future resolves to its Sentiment
+
+        Never blocks: the cache (which may hit SQLite) is consulted on the
+        worker thread, so this is safe to call from the event loop.
+        """
+        fut: Future = Future()
+        self._queue.put((content, fut))
+        return fut
+
+
+    def submit_many(self, contents: list[str]) -> list[Future]:
+        """Queue several strings at once, futures are returned in input order"""
+        return [self.submit(c) for c in contents]
+
+
+    def close(self):
+        """Stop the worker after the requests already queued are scored"""
+        self._queue.put(None)
+        self._worker.join()
+
+
+    def _collect(self, first: tuple[str, Future]) -> tuple[list[tuple[str, Future]], bool]:
+        """Gather requests until the window closes or the batch is full"""
+        batch = [first]
+        deadline = time.monotonic() + self.wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+
+            # skip callers that already gave up
+            batch = [(c, f) for c, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                # cached contents are answered without the model
+                probs = score_cached([c for c, _ in batch], self.engine, self.cache)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), prob in zip(batch, probs):
+                fut.set_result(_to_sentiment(prob))
+
+
+def _to_sentiment(prob) -> Sentiment:
+    return Sentiment(
+        positive=float(prob[0]),
+        negative=float(prob[1]),
+        neutral=float(prob[2])
+    )
+
+
+# ----- Shared batcher -----
+
+_shared_batcher: SentimentBatcher | None = None
+_shared_lock = threading.Lock()
+
+
+def init_shared_batcher() -> SentimentBatcher:
+    """Start the process-wide batcher if it is not running yet."""
+    global _shared_batcher
+    with _shared_lock:
+        if _shared_batcher is None:
+            _shared_batcher = SentimentBatcher(
+                get_engine,
+                settings.SENTIMENT_BATCH_WAIT_MS,
+                settings.SENTIMENT_MAX_BATCH_SIZE,
+                get_cache()
+            )
+        return _shared_batcher
+
+
+def get_shared_batcher() -> SentimentBatcher:
+    """Return the process-wide batcher, starting it lazily when needed."""
+    batcher = _shared_batcher
+    if batcher is None:
+        batcher = init_shared_batcher()
+    return batcher
+
+
+def close_shared_batcher() -> None:
+    """Drain and stop the process-wide batcher (application shutdown)."""
+    global _shared_batcher
+    with _shared_lock:
+        if _shared_batcher is not None:
+            _shared_batcher.close()
+            _shared_batcher = None
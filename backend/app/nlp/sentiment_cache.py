@@ -0,0 +1,126 @@
+"""
+    Content-hash sentiment cache (in-memory LRU + optional SQLite tier)
+"""
+
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize(content: str) -> str:
+    """Canonical form of a post used for hashing, whitespace and unicode differences are ignored"""
+    return " ".join(unicodedata.normalize("NFC", content).split())
+
+
+class SentimentCache:
+    """Sentiment probabilities keyed by hash(model id + normalized content)"""
+
+    def __init__(self, model_id: str, max_entries: int, path: str | Path | None = None):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Optional on-disk tier, survives restarts and is shared by workers
+        self._conn = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment "
+                "(key BLOB PRIMARY KEY, positive REAL, negative REAL, neutral REAL)"
+            )
+            self._conn.commit()
+
+
+    def key(self, content: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{normalize(content)}".encode("utf-8")).digest()
+
+
+    def get(self, content: str) -> np.ndarray | None:
+        """Return cached probabilities for one content, or None on a miss"""
+        probs, misses = self.lookup([content])
+        return None if misses else probs[0]
+
+
+    def lookup(self, contents: list[str]) -> tuple[np.ndarray, list[int]]:
+        """Return (N, 3) probabilities and the indices that still need the model"""
+        probs = np.zeros((len(contents), 3), dtype=np.float32)
+        keys = [self.key(c) for c in contents]
+        disk_misses: list[int] = []
+
+        # 1. Memory tier
+        with self._lock:
+            for i, k in enumerate(keys):
+                hit = self._memory.get(k)
+                if hit is None:
+                    disk_misses.append(i)
+                else:
+                    self._memory.move_to_end(k)
+                    probs[i] = hit
+
+        if not disk_misses or self._conn is None:
+            return probs, disk_misses
+
+        # 2. Disk tier, promoted into memory on hit
+        wanted = list({keys[i] for i in disk_misses})
+        found: dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for k, pos, neg, neu in self._conn.execute(
+                    f"SELECT key, positive, negative, neutral FROM sentiment WHERE key IN ({placeholders})",
+                    chunk
+                ):
+                    found[k] = np.array([pos, neg, neu], dtype=np.float32)
+            for k, hit in found.items():
+                self._remember(k, hit)
+
+        misses = []
+        for i in disk_misses:
+            hit = found.get(keys[i])
+            if hit is None:
+                misses.append(i)
+            else:
+                probs[i] = hit
+        return probs, misses
+
+
+    def store(self, contents: list[str], probs: np.ndarray) -> None:
+        """Insert freshly scored contents into both tiers"""
+        rows = [(self.key(c), np.asarray(p, dtype=np.float32)) for c, p in zip(contents, probs)]
+        with self._lock:
+            for k, p in rows:
+                self._remember(k, p)
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?, ?)",
+                    [(k, float(p[0]), float(p[1]), float(p[2])) for k, p in rows]
+                )
+                self._conn.commit()
+
+
+    def _remember(self, key: bytes, probs: np.ndarray) -> None:
+        """Memory-tier insert with LRU eviction, caller holds the lock"""
+        self._memory[key] = probs
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,249 @@
+"""
+    Multi-process FinBERT worker pool
+"""
+
+import logging
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def core_slices(workers: int) -> list[list[int] | None]:
+    """Split the cores this process may run on into one contiguous slice per worker (None: not enough to pin)"""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if len(cores) < workers:
+        return [None] * workers
+    return [[int(c) for c in part] for part in np.array_split(cores, workers)]
+
+
+def _serve(conn, cores: list[int] | None, threads: int):
+    """Worker process: pin, load its own engine, then score every list of contents received on the pipe"""
+    from app.nlp.sentiment import load_engine
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    try:
+        engine = load_engine(num_threads=threads)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            contents = conn.recv()
+        except EOFError:
+            break
+        if contents is None:
+            break
+        try:
+            conn.send(("ok", engine.predict(contents)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+START_TIMEOUT = 300.0       # seconds a worker may take to load its engine
+
+
+class SentimentPool:
+    """N scoring processes, each pinned to its own slice of cores with its own torch thread count
+
+    Each worker loads its own engine (SENTIMENT_BACKEND) and is fed over a
+    pipe. predict() cuts a batch into shards of at least shard_size posts and
+    scores them on idle workers at the same time, so it is a drop-in for
+    SentimentEngine.predict that scales with the number of cores. A worker
+    that dies or overruns timeout fails its shard and is restarted in the
+    background; once none can be restarted, predict() raises straight away.
+    """
+
+    def __init__(self, workers: int, threads_per_worker: int = 0, shard_size: int = 16, timeout: float = 60.0):
+        self.shard_size = shard_size
+        self.timeout = timeout
+        self._ctx = mp.get_context("spawn")     # spawn (not fork) so no worker inherits the parent's torch thread pools
+        self._idle: queue.Queue = queue.Queue() # slot numbers of workers waiting for a shard
+        self._slots: list[tuple[list[int] | None, int]] = []
+        self._procs: list[mp.Process | None] = []
+        self._conns: list = []
+        self._alive = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+        # 1. Start every worker, each on its own slice of cores
+        for cores in core_slices(workers):
+            self._slots.append((cores, threads_per_worker or (len(cores) if cores else 1)))
+            self._procs.append(None)
+            self._conns.append(None)
+        for slot in range(workers):
+            self._spawn(slot)
+
+        # 2. Wait until every worker has its model loaded
+        for slot in range(workers):
+            try:
+                self._ready(slot)
+            except RuntimeError:
+                self.close()
+                raise
+            self._alive += 1
+            self._idle.put(slot)
+
+        self._dispatch = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sentiment-pool")
+
+
+    @property
+    def workers(self) -> int:
+        return len(self._procs)
+
+
+    def _spawn(self, slot: int):
+        cores, threads = self._slots[slot]
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_serve, args=(child, cores, threads), name=f"sentiment-worker-{slot}", daemon=True)
+        proc.start()
+        child.close()
+        self._procs[slot], self._conns[slot] = proc, parent
+
+
+    def _ready(self, slot: int):
+        """Block until the worker in slot reports its engine loaded, RuntimeError if it never does"""
+        proc, conn = self._procs[slot], self._conns[slot]
+        try:
+            if not conn.poll(START_TIMEOUT):
+                raise EOFError(f"no answer within {START_TIMEOUT:.0f}s")
+            status, detail = conn.recv()
+        except (EOFError, OSError) as e:
+            self._stop(slot)
+            status, detail = "error", f"{proc.name} exited with code {proc.exitcode} ({e})"
+        if status != "ready":
+            raise RuntimeError(f"Sentiment worker failed to start: {detail}")
+
+
+    def _stop(self, slot: int):
+        proc, conn = self._procs[slot], self._conns[slot]
+        if proc.is_alive():
+            proc.kill()                         # SIGKILL, a hung worker may not act on SIGTERM
+        proc.join(timeout=5)
+        conn.close()
+
+
+    def _respawn(self, slot: int):
+        """Replace a dead or hung worker, the slot is given up if the new one does not start either"""
+        self._stop(slot)
+        with self._lock:
+            if self._closed:
+                return
+            self._spawn(slot)
+        try:
+            self._ready(slot)
+        except RuntimeError as e:
+            logging.error(f"{e}, running with one worker less")
+            with self._lock:
+                self._alive -= 1
+            return
+        logging.info(f"Sentiment worker {slot} restarted")
+        self._idle.put(slot)
+
+
+    def _acquire(self) -> int:
+        """Next idle worker, raises once no worker is left instead of waiting forever"""
+        while True:
+            if self._alive <= 0:
+                raise RuntimeError("No sentiment workers left")
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+
+    def shards(self, n: int) -> list[slice]:
+        """Contiguous ranges, as many as there are workers but none smaller than shard_size"""
+        size = max(self.shard_size, math.ceil(n / self.workers))
+        return [slice(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+    def _score(self, contents: list[str]) -> np.ndarray:
+        slot = self._acquire()
+        conn = self._conns[slot]
+        try:
+            conn.send(contents)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"no answer within {self.timeout:.0f}s")
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            # 1. Dead or hung worker: fail this shard now, bring a fresh worker up behind it
+            logging.error(f"Sentiment worker {slot} lost: {e}")
+            threading.Thread(target=self._respawn, args=(slot,), name=f"sentiment-respawn-{slot}", daemon=True).start()
+            raise RuntimeError(f"Sentiment worker lost: {e}")
+        self._idle.put(slot)
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+
+    def predict(self, contents: list[str]) -> np.ndarray:
+        """Return (N, 3) positive/negative/neutral probabilities in input order"""
+        probs = np.empty((len(contents), 3), dtype=np.float32)
+        if not contents:
+            return probs
+
+        shards = self.shards(len(contents))
+        futures = [self._dispatch.submit(self._score, contents[s]) for s in shards]
+        for s, fut in zip(shards, futures):
+            probs[s] = fut.result()
+        return probs
+
+
+    def close(self):
+        """Stop every worker once it has finished its current shard"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if hasattr(self, "_dispatch"):
+            self._dispatch.shutdown(wait=True)
+        started = [(proc, conn) for proc, conn in zip(self._procs, self._conns) if proc is not None]
+        for _, conn in started:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc, conn in started:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+            conn.close()
+
+
+# ----- Shared pool -----
+
+_shared_pool: SentimentPool | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool() -> SentimentPool:
+    """Return the process-wide pool of SENTIMENT_WORKERS processes, started on first use."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = SentimentPool(
+                settings.SENTIMENT_WORKERS,
+                settings.SENTIMENT_WORKER_THREADS,
+                settings.SENTIMENT_SHARD_SIZE,
+                settings.SENTIMENT_WORKER_TIMEOUT
+            )
+        return _shared_pool
+
+
+def close_shared_pool() -> None:
+    """Stop the worker processes (application shutdown)."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None
@@ -0,0 +1,94 @@
+"""
+    Async stage runner for the master pipelines
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+
+
+class StageRunner:
+    """Runs blocking pipeline stages off the event loop, with a concurrency limit per stage
+
+    CPU-bound work (entity matching, RAG search, price math) goes to a small
+    dedicated pool so it cannot starve the blocking I/O pool (post files,
+    market data), and neither of them is the server's default threadpool, so
+    /health and the client endpoints stay responsive while pipelines run.
+    """
+
+    def __init__(self, cpu_workers: int, io_workers: int, limits: dict[str, int]):
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="pipeline-cpu")
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="pipeline-io")
+        self.limits = limits
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+    def limit(self, stage: str) -> asyncio.Semaphore:
+        """Semaphore bounding how many requests are inside a stage at once"""
+        sem = self._semaphores.get(stage)
+        if sem is None:
+            sem = self._semaphores[stage] = asyncio.Semaphore(self.limits.get(stage, 1))
+        return sem
+
+
+    async def cpu(self, stage: str, fn: Callable[..., Any], *args) -> Any:
+        async with self.limit(stage):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.cpu_pool, functools.partial(fn, *args))
+
+
+    async def io(self, stage: str, fn: Callable[..., Any], *args) -> Any:
+        async with self.limit(stage):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.io_pool, functools.partial(fn, *args))
+
+
+    def close(self):
+        self.cpu_pool.shutdown(wait=True, cancel_futures=True)
+        self.io_pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ----- Shared runner -----
+
+_shared_runner: StageRunner | None = None
+_shared_lock = threading.Lock()
+
+
+def init_shared_runner() -> StageRunner:
+    """Create the process-wide stage runner if it does not exist yet."""
+    global _shared_runner
+    with _shared_lock:
+        if _shared_runner is None:
+            _shared_runner = StageRunner(
+                settings.PIPELINE_CPU_WORKERS,
+                settings.PIPELINE_IO_WORKERS,
+                {
+                    "fetch": settings.PIPELINE_FETCH_CONCURRENCY,
+                    "sentiment": settings.PIPELINE_SENTIMENT_CONCURRENCY,
+                    "entity": settings.PIPELINE_ENTITY_CONCURRENCY,
+                    "finance": settings.PIPELINE_FINANCE_CONCURRENCY,
+                    "store": settings.PIPELINE_STORE_CONCURRENCY,
+                }
+            )
+        return _shared_runner
+
+
+def get_shared_runner() -> StageRunner:
+    """Return the process-wide stage runner, creating it lazily when needed."""
+    runner = _shared_runner
+    if runner is None:
+        runner = init_shared_runner()
+    return runner
+
+
+def close_shared_runner() -> None:
+    """Stop the stage pools (application shutdown)."""
+    global _shared_runner
+    with _shared_lock:
+        if _shared_runner is not None:
+            _shared_runner.close()
+            _shared_runner = None
@@ -4,12 +4,16 @@
 
 
 import json
+import logging
+import threading
 from dotenv import load_dotenv
-from truthbrush import Api
 from concurrent.futures import ThreadPoolExecutor
 import os
+from app.core.config import settings
 from app.models.models import RawPost
-from datetime import datetime
+from app.nlp.post_store import TRUTH_SOCIAL, PostStore, get_shared_post_store
+from datetime import datetime, timezone
+from typing import Iterable, Protocol
 import asyncio
 
 load_dotenv()
@@ -17,48 +21,249 @@ load_dotenv()
 TRUTHSOCIAL_USERNAME = os.getenv("TRUTHSOCIAL_USERNAME")
 TRUTHSOCIAL_PASSWORD = os.getenv("TRUTHSOCIAL_PASSWORD")
 
-api = Api(username=TRUTHSOCIAL_USERNAME, password=TRUTHSOCIAL_PASSWORD)
+_api = None
 
 
-def download_posts(username="realDonaldTrump", limit=1000, out_file="trump_posts.json"):
-    posts = []
-    print(f"Downloading up to {limit} posts for: {username}")
+def get_api():
+    """Truth Social client, built on first use so importing this module has no side effects"""
+    global _api
+    if _api is None:
+        from truthbrush import Api
+        _api = Api(username=TRUTHSOCIAL_USERNAME, password=TRUTHSOCIAL_PASSWORD)
+    return _api
 
-    for i, status in enumerate(api.pull_statuses(username)):
-        if i >= limit:
-            break
-        posts.append(status)
 
-    with open(out_file, "w") as f:
-        json.dump(posts, f, indent=2)
+class PartialPull(Exception):
+    """Raised by a client after its last status when the pull stopped early (error page, dropped connection)"""
 
-    print(f"Saved {len(posts)} posts → {out_file}")
 
+class StatusClient(Protocol):
+    """Source of Truth Social statuses, newest first, stopping at since_id
 
-async def get_posts(user: str, max_posts):
-    loop = asyncio.get_running_loop()
-    raw_statuses = await loop.run_in_executor(None, api.pull_statuses, user)
-        
-    raw_posts: list[RawPost] = []
-
-    for i, status in enumerate(raw_statuses):
-        if i >= max_posts:
-            break
+    A pull that ends before reaching since_id (or the account's oldest page)
+    raises PartialPull once everything it did get has been yielded.
+    """
+
+    def pull_statuses(self, username: str, since_id=None) -> Iterable[dict]:
+        ...
+
+
+class TruthbrushClient:
+    """The real API, logged in on first pull
+
+    truthbrush logs request and API errors and then just stops paging, so any
+    error it logs on this thread during the pull marks the pull as partial.
+    """
+
+    def pull_statuses(self, username: str, since_id=None) -> Iterable[dict]:
+        from loguru import logger
+
+        errors: list[str] = []
+        thread = threading.get_ident()
+        sink = logger.add(
+            lambda message: errors.append(message.record["message"]),
+            level="ERROR",
+            filter=lambda record: record["thread"].id == thread and record["name"].startswith("truthbrush")
+        )
         try:
-            timestamp = datetime.fromisoformat(status['created_at'].replace("Z", "+00:00"))
-            raw_post = RawPost(
-                post_id=status['id'],
-                timestamp=timestamp,
-                username=status['account']['username'],
-                content=status['content']
+            yield from get_api().pull_statuses(username, since_id=since_id)
+        finally:
+            logger.remove(sink)
+        if errors:
+            raise PartialPull(errors[-1])
+
+
+class FakeStatusClient:
+    """Serves fixed status pages per account, for tests and offline runs"""
+
+    def __init__(self, statuses: dict[str, list[dict]], page_size: int = 20, fail_after_pages: int | None = None):
+        self.statuses = statuses
+        self.page_size = page_size
+        self.fail_after_pages = fail_after_pages        # serve this many pages, then stop like a failed request
+        self.calls: list[tuple[str, str | None]] = []
+
+
+    def pull_statuses(self, username: str, since_id=None) -> Iterable[dict]:
+        self.calls.append((username, since_id))
+        posts = sorted(self.statuses.get(username, []), key=lambda s: int(s["id"]), reverse=True)
+        for page, i in enumerate(range(0, len(posts), self.page_size)):
+            if self.fail_after_pages is not None and page >= self.fail_after_pages:
+                raise PartialPull(f"page {page} of {username} failed")
+            for status in posts[i:i + self.page_size]:
+                if since_id is not None and int(status["id"]) <= int(since_id):
+                    return
+                yield status
+
+
+def to_raw_post(status: dict) -> RawPost:
+    return RawPost(
+        post_id=str(status['id']),
+        timestamp=datetime.fromisoformat(status['created_at'].replace("Z", "+00:00")),
+        username=status['account']['username'],
+        content=status['content']
+    )
+
+
+class TruthSocialIngester:
+    """Pulls only statuses newer than each account's high-water mark into the post store
+
+    Accounts are ingested concurrently on a bounded pool and posts are written
+    in batches. The checkpoint only moves once an account's pull has reached
+    the previous mark (or the oldest status), so an interrupted pull is simply
+    repeated (inserts are idempotent).
+    """
+
+    def __init__(self, client: StatusClient, store: PostStore, max_workers: int = 4, batch_size: int = 100):
+        self.client = client
+        self.store = store
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+
+    def ingest(self, username: str, limit: int | None = None) -> int:
+        """Pull one account's new statuses, returns how many posts were added
+
+        limit caps the first pull of an account (no checkpoint yet) to its
+        newest statuses instead of the whole history, later pulls always run
+        down to the checkpoint so they leave no gaps.
+        """
+        checkpoint = self.store.checkpoint(TRUTH_SOCIAL, username)
+        since_id = checkpoint[0] if checkpoint else None
+        cap = limit if since_id is None else None
+
+        added = 0
+        pulled = 0
+        complete = True
+        newest_id: int | None = None            # unparseable statuses still move the mark
+        newest_ts: datetime | None = None
+        batch: list[RawPost] = []
+        statuses = iter(self.client.pull_statuses(username, since_id=since_id))
+        while cap is None or pulled < cap:
+            try:
+                status = next(statuses)
+            except StopIteration:
+                break
+            except PartialPull as e:
+                logging.warning(f"Truth Social pull for {username} stopped early, keeping its checkpoint: {e}")
+                complete = False
+                break
+            pulled += 1
+            if newest_id is None or int(status["id"]) > newest_id:
+                newest_id = int(status["id"])
+            try:
+                post = to_raw_post(status)
+            except Exception as e:
+                logging.warning(f"Skipping post {status.get('id')} due to error: {e}")
+                continue
+            if newest_ts is None or post.timestamp > newest_ts:
+                newest_ts = post.timestamp
+            batch.append(post)
+            if len(batch) >= self.batch_size:
+                added += self.store.add(TRUTH_SOCIAL, batch)
+                batch = []
+        if batch:
+            added += self.store.add(TRUTH_SOCIAL, batch)
+        if hasattr(statuses, "close"):
+            statuses.close()                    # a capped pull stops paging here
+
+        if complete and newest_id is not None:
+            if newest_ts is None:
+                newest_ts = checkpoint[1] if checkpoint else datetime.now(timezone.utc)
+            self.store.set_checkpoint(TRUTH_SOCIAL, username, str(newest_id), newest_ts)
+        return added
+
+
+    def ingest_many(self, usernames: list[str]) -> dict[str, int]:
+        """Ingest accounts concurrently, failed accounts are logged and reported as -1"""
+        def run(username):
+            try:
+                return self.ingest(username)
+            except Exception as e:
+                logging.error(f"Truth Social ingest failed for {username}: {e}")
+                return -1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ts-ingest") as pool:
+            return dict(zip(usernames, pool.map(run, usernames)))
+
+
+    def start(self, usernames: list[str], interval: float) -> threading.Thread:
+        """Re-ingest the accounts every interval seconds in a background thread"""
+        def loop():
+            while not self._stop.is_set():
+                added = self.ingest_many(usernames)
+                logging.info(f"Truth Social ingest: {added}")
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="ts-ingester", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# ----- Shared ingester -----
+
+_shared_ingester: TruthSocialIngester | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_ingester() -> TruthSocialIngester:
+    """Return the process-wide ingester writing into the shared post store."""
+    global _shared_ingester
+    with _shared_lock:
+        if _shared_ingester is None:
+            _shared_ingester = TruthSocialIngester(
+                TruthbrushClient(),
+                get_shared_post_store(),
+                settings.INGEST_MAX_WORKERS,
+                settings.INGEST_BATCH_SIZE
             )
-            raw_posts.append(raw_post)
-        except Exception as e:
-            print(f"Skipping post {status.get('id')} due to error: {e}")
+        return _shared_ingester
+
+
+def start_shared_ingester() -> None:
+    """Start background ingestion of TRUTH_SOCIAL_ACCOUNTS when an interval is configured."""
+    if settings.TRUTH_SOCIAL_ACCOUNTS and settings.TRUTH_SOCIAL_INGEST_INTERVAL > 0:
+        get_shared_ingester().start(settings.TRUTH_SOCIAL_ACCOUNTS, settings.TRUTH_SOCIAL_INGEST_INTERVAL)
+
+
+def stop_shared_ingester() -> None:
+    global _shared_ingester
+    with _shared_lock:
+        if _shared_ingester is not None:
+            _shared_ingester.stop()
+            _shared_ingester = None
+
+
+def download_posts(username="realDonaldTrump", limit=1000, out_file="trump_posts.json"):
+    """Ingest new posts for username, then export the newest limit posts from the store"""
+    print(f"Downloading new posts for: {username}")
+    added = get_shared_ingester().ingest(username, limit)
+
+    posts = list(get_shared_post_store().latest(TRUTH_SOCIAL, username, limit))
+    with open(out_file, "w") as f:
+        json.dump([post.model_dump() for post in posts], f, indent=2, default=str)
+
+    print(f"Added {added} posts, saved {len(posts)} posts → {out_file}")
+
+
+async def get_posts(user: str, max_posts):
+    """Ingest only statuses newer than the checkpoint, then read the newest max_posts from the store"""
+    ingester = get_shared_ingester()
+    await asyncio.to_thread(ingester.ingest, user, max_posts)
+    return await asyncio.to_thread(lambda: list(ingester.store.latest(TRUTH_SOCIAL, user, max_posts)))
 
-    return raw_posts
 
 if __name__ == "__main__":
-    posts = asyncio.run(get_posts("realDonaldTrump", 500))
-    with open("trump_posts_500.json", "w") as f:
-        json.dump([post.model_dump() for post in posts], f, indent=2, default=str)
\ No newline at end of file
+    # python -m app.nlp.truth_social [account ...]
+    import sys
+    accounts = sys.argv[1:] or settings.TRUTH_SOCIAL_ACCOUNTS or ["realDonaldTrump"]
+    print(get_shared_ingester().ingest_many(accounts))
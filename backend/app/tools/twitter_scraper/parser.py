@@ -1,218 +1,169 @@
-# INTERNAL TOOL FOR PARSING AN HTML FILE SAVED FROM SOMEONE'S TWITTER PROFILE -> TO A JSON FILE THAT WILL BE READ BY interpreter.py
-# also saves a MASTER file for if we want to continue adding posts from the same user's profile
-# make sure to format the html file first using vscode... perhaps ill think of a better way later
+# INTERNAL TOOL FOR PARSING HTML FILES SAVED FROM SOMEONE'S TWITTER PROFILE -> INTO THE POST STORE READ BY interpreter.py
+# works on the raw saved html (no formatting needed), streams each file through a single-pass compiled-regex tokenizer,
+# parses many files in parallel across processes and only appends tweets the store does not have yet
+#
+# usage (from backend/): python -m app.tools.twitter_scraper.parser nasa18.html saved/*.html [--workers 8]
 
-import os
+import html
 import re
-import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from app.models.models import RawPost
+
+CHUNK_SIZE = 1 << 20 # characters tokenized at a time
+
+# regex stuff, compiled once
+RE_TOKEN = re.compile(                                                                   # one html token per match:
+    r'<(/?)([a-zA-Z][\w:-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>'                           #   start / end tag (name, raw attributes)
+    r'|<!--.*?-->|<[!?][^>]*>'                                                           #   comment, doctype
+    r'|([^<]+)',                                                                         #   text
+    re.S
+)
+RE_ATTR = re.compile(r'([\w:-]+)\s*=\s*"([^"]*)"')
+RE_INTERESTING = re.compile(r'href=|datetime=|data-testid="tweetText"')                  # only these tags get their attributes parsed
+RE_STATUS_URL = re.compile(r"^(?:https?://(?:x|twitter)\.com)?/([^/?#]+)/status/(\d+)$")  # permalink of a tweet, marks author + id
+RE_SPACES = re.compile(r"\s+")
+
+TWEET_TEXT = "tweetText" # data-testid of the element holding a tweet's contents
+VOID_TAGS = {"area", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
 
 ##############################################################################
 ## PARSE
 ##############################################################################
-FILE_PATH = "nasa18.html" # CHANGE THIS TO THE FILE YOU WANT TO PARSE
-
-OUTPUT_PATH = "data/twitter_scraper/"
-OUTPUT_MASTER = "nasa"
-
-# nested dictionary for storing tweet contents
-# keys - post id
-tweet_contents = {}
-# nested keys
-KEY_CONTENT = "content" # content:str
-KEY_AUTHOR = "author"   # author:str
-KEY_DATE = "date"       # date:str (UTC standard)
-
-START_POINT_OFFSET = 3 # start point offset (in lines)
-
-# regex stuff
-RE_TWEET_STARTER = r'"https://x.com/([^/]*)/status/([^/]*)"'    # used to find the url which marks where the author and datetime information will be
-RE_DATETIME = r'datetime="([^"]*)"'                         # used to find the datetime information specifically
-RE_TWEET_INDICATOR = r"tweetText"                           # used to find the start of a tweet's contents (occurs sometime after a tweet url)
-RE_CLASS_START = r'class="([^"]*)"'                         # used to find the garbage html on the first line of a tweet's content
-RE_SPAN_START = r"<span"                                    # used to check if a tweet contains text
-RE_EMOJI_START = r"</span><img"                             # emojis appear as these elements within an existing tweet's content
-RE_SPAN_END = r"</span>"                                    # used to find the end of a tweet's contents
-RE_SPAN_END_END = r"</span><a"
-RE_MENTION_START = "<div"
-RE_MENTION_HEADER = r'style="([^"]*)">'
-RE_MENTION_END = r"</a>"
-RE_HASHTAG_START = r"</span><span"
-RE_DIV = r"</div>"
-
-# returns a dictionary with the nested keys listed above
-def make_subdict() -> dict[str, str]:
-    subdict = {
-        KEY_CONTENT: None, 
-        KEY_AUTHOR: None, 
-        KEY_DATE: None
-    }
-    return subdict
-
-# removes garbage from a string
-# garbage consists of
-#   class="... ... ... ... ..."> at the start of the string
-#   </span> at the end of the string
-def clean_str(string:str) -> str:
-    garbage_start = re.search(RE_CLASS_START, string)
-    garbage_span = re.search(RE_SPAN_END, string)
-    if garbage_start:
-        string = string[garbage_start.end() + 1:]
-    if garbage_span:
-        string = string[:garbage_span.start()]
-    return string
-
-# gets the username from a url like
-# "https://x.com/<username>/status/<numbers>"
-# PRECONDITION: the inputted string must be in this format
-def get_username(string:str) -> str:
-    return string[14:re.search(r"/status/", string).start()]
-
-# turns a url into a post id
-# "https://x.com/<username>/status/<numbers>" -> "<username><number>"
-# PRECONDITION: the inputted string must be in this format
-def get_postid(string:str) -> str:
-    midpoint = re.search(r"/status/", string)
-    return string[14:midpoint.start()].lower() + string[midpoint.end():-1] 
-
-# gets the datetime from a datetime element
-# datetime="<datetime>" -> <datetime>
-# PRECONDITION: the inputted string must be in this format
-def get_date(string:str) -> str:
-    start = re.search(r'"', string)
-    return string[start.start()+1:-1]
-
-os.chdir("../../") # go up to the app directory
-
-try:
-    with open(f"{OUTPUT_PATH}{OUTPUT_MASTER}_MASTER.json", "r") as f:
-        tweet_contents = json.load(f)
-except FileNotFoundError:
-    print("No existing json")
-
-os.chdir("tools/twitter_scraper")
-
-try:
-    added = 0
-    skipped = 0
-    with open(FILE_PATH, "r", encoding="utf-8") as f:
-        found_starter = False    # whether data has been found for the next tweet's contents
-        reading = False          # whether we are currently reading a tweet's contents
-        skipping_emoji = False   # whether or not the parser is currently skipping an emoji
-        skipping_mention = False # whether or not the parser is currently skipping a mention
-        mention_found = True
-        start_point = 0          # the line to begin reading
-        curr_id = ""             # id of the current tweet we are reading
-        curr_content = ""        # the current message we are reading
-
-        for line_num, line in enumerate(f):
-            starter = re.search(RE_TWEET_STARTER, line)
-            if starter: # FOUND TWEET "starter", contains a link to the tweet, along with datetime
-                url = line[starter.start()+1:starter.end()]
-                username = get_username(url).lower()
-                curr_id = get_postid(url)
-                if curr_id in tweet_contents: # already exists
-                    print(f"{curr_id} already exists! Skipping...")
-                    skipped += 1
+class TweetParser:
+    """Single-pass, event-based tokenizer over a saved profile page
+
+    feed() takes the raw html in arbitrary chunks (no formatting needed). An
+    <article> starts a tweet, its first status permalink gives author and id,
+    the first <time datetime> its date, and the text (with mentions, hashtags
+    and cashtags) under data-testid="tweetText" its content. Emoji images are
+    skipped. Tweets without a date or text are dropped.
+    """
+
+    def __init__(self):
+        self.tweets: dict[str, dict] = {}  # post id -> {author, date, content}
+        self.current: dict | None = None
+        self.text_depth = 0                # > 0 while inside a tweetText element
+        self.text: list[str] = []
+        self._pending = ""                 # unfinished tag carried over to the next chunk
+
+
+    def feed(self, chunk: str):
+        data = self._pending + chunk
+        cut = data.rfind("<")
+        if cut == -1:
+            cut = len(data)
+        self._pending = data[cut:]
+        self._tokenize(data[:cut])
+
+
+    def close(self):
+        self._tokenize(self._pending)
+        self._pending = ""
+
+
+    def _tokenize(self, data: str):
+        for m in RE_TOKEN.finditer(data):
+            text = m.group(4)
+            if text is not None:
+                if self.text_depth:
+                    self.text.append(text)
+            elif m.group(2) is not None:
+                if m.group(1):
+                    self.handle_endtag()
                 else:
-                    tweet_contents[curr_id] = make_subdict() # add an entry for this tweet in the dictionary
-                    tweet_contents[curr_id][KEY_AUTHOR] = username
-                    found_starter = True
-                    added += 1
-                    #i += 1 # COUNTER FOR DEBUG PURPOSES
-            
-            date = re.search(RE_DATETIME, line)
-            if curr_id in tweet_contents and tweet_contents[curr_id][KEY_DATE] is None and date:
-                tweet_contents[curr_id][KEY_DATE] = get_date(line[date.start()+1:date.end()])
-
-            if re.search(RE_TWEET_INDICATOR, line) and found_starter: # BEGIN READ if starter information exists
-                reading = True
-                found_starter = False
-                start_point = line_num + START_POINT_OFFSET
-
-            if reading:
-                if not skipping_emoji and not skipping_mention: # things that can only happen if parser is not currently skipping over an emoji/mention
-                    if line_num == start_point - 1 and not re.search(RE_SPAN_START, line): # if the tweet is not text, END READ immediately
-                        reading = False
-                        continue
-
-                    if line.strip() == RE_MENTION_START or re.search(RE_HASHTAG_START, line):
-                        #print(line)
-                        skipping_mention = True
-                        mention_found = False
-                    elif not re.search(RE_DIV, line) and line_num >= start_point:
-                        curr_content += clean_str(line.strip()) + " " # add message content, without the newline and leading/trailing whitespace
-
-                    if re.search(RE_DIV, line) or re.search(RE_SPAN_END_END, line):
-                        #print(curr_content)
-                        tweet_contents[curr_id][KEY_CONTENT] = curr_content # add message contents to dict entry
-                        reading = False
-                        curr_content = ""
-                        continue
-                else: # THE PARSER IS CURRENTLY SKIPPING OVER AN EMOJI/MENTION
-                    if skipping_mention:
-                        mention = re.search(RE_MENTION_HEADER, line) 
-                        end = re.search(RE_MENTION_END, line)
-                        if mention:
-                            mention_found = True
-                        if mention and end:
-                            curr_content += line[mention.end():end.start()] + " " # append the mention to the message
-                            #print(line[mention.end():end.start()])
-                    if mention_found and re.search(RE_SPAN_START, line): 
-                        start_point = line_num + 1
-                        skipping_emoji = False
-                        skipping_mention = False
-                        mention_found = True
-                    elif re.search(RE_DIV, line):
-                        #print(curr_content)
-                        tweet_contents[curr_id][KEY_CONTENT] = curr_content # add message contents to dict entry
-                        reading = False
-                        skipping_emoji = False
-                        skipping_mention = False
-                        mention_found = True
-                        curr_content = ""
-                        continue
-
-                if re.search(RE_EMOJI_START, line): # determine the start of an emoji, ignore all the info inside (shift start_point)
-                    skipping_emoji = True
-    print(f"Finished parsing! Added {added}; Skipped {skipped}; Total entries is now {len(tweet_contents.keys())}")
-except FileNotFoundError:
-    print("File not found")
+                    self.handle_starttag(m.group(2).lower(), m.group(3))
+
+
+    def handle_starttag(self, tag: str, raw_attrs: str):
+        if self.text_depth:
+            if tag not in VOID_TAGS and not raw_attrs.endswith("/"):
+                self.text_depth += 1
+            return
+
+        if tag == "article":
+            self.current = None
+            return
+        if not RE_INTERESTING.search(raw_attrs):
+            return
+
+        attrs = dict(RE_ATTR.findall(raw_attrs))
+        if tag == "a" and self.current is None:
+            match = RE_STATUS_URL.match(html.unescape(attrs.get("href", "")))
+            if match:
+                author = match.group(1).lower()
+                post_id = author + match.group(2)
+                self.current = self.tweets.setdefault(post_id, {"author": author, "date": None, "content": None})
+        elif tag == "time" and self.current is not None and self.current["date"] is None:
+            self.current["date"] = attrs.get("datetime")
+        elif attrs.get("data-testid") == TWEET_TEXT and self.current is not None and self.current["content"] is None:
+            self.text_depth = 1
+            self.text = []
+
+
+    def handle_endtag(self):
+        if self.text_depth:
+            self.text_depth -= 1
+            if self.text_depth == 0:
+                content = html.unescape(RE_SPACES.sub(" ", "".join(self.text))).strip()
+                self.current["content"] = content or None
+
+
+def parse_html(chunks) -> list[RawPost]:
+    """Feed html chunks through one TweetParser, returns the complete tweets"""
+    parser = TweetParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+
+    posts = []
+    for post_id, tweet in parser.tweets.items():
+        if tweet["date"] is None or tweet["content"] is None:
+            continue
+        posts.append(RawPost(
+            post_id=post_id,
+            timestamp=datetime.fromisoformat(tweet["date"].replace("Z", "+00:00")),
+            username=tweet["author"],
+            content=tweet["content"]
+        ))
+    return posts
+
+
+def parse_file(path: str | Path) -> list[RawPost]:
+    """Stream one saved html file through the parser without loading it whole"""
+    def chunks():
+        with open(path, "r", encoding="utf-8") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    return parse_html(chunks())
+
 
 ##############################################################################
-## JSON
+## STORE
 ##############################################################################
-os.chdir("../../") # go up to the app directory
-
-try:
-    with open(f"{OUTPUT_PATH}{OUTPUT_MASTER}_MASTER.json", 'x') as f:
-        f.write("")
-    print(f"File '{OUTPUT_PATH}{OUTPUT_MASTER}_MASTER.json' created successfully.")
-except FileExistsError:
-    pass
-    #print(f"File '{OUTPUT_PATH}{FILE_PATH[:-5]}_MASTER.json' already exists. No new file was created.")
-
-with open(f"{OUTPUT_PATH}{OUTPUT_MASTER}_MASTER.json", "w", encoding="utf-8") as f:
-    json.dump(tweet_contents, f, indent=4)
-    print("Master JSON wrote successfully")
-
-tweets_by_user = {}
-for key in tweet_contents.keys():
-    username = tweet_contents[key][KEY_AUTHOR]
-    if username not in tweets_by_user:
-        tweets_by_user[username] = {}
-    tweets_by_user[username][key] = make_subdict()
-    tweets_by_user[username][key] = tweet_contents[key]
-
-for username in tweets_by_user.keys():
-    DEST = f"{OUTPUT_PATH}{username}.json"
-    try:
-        with open(DEST, 'x') as f:
-            f.write("")
-        print(f"File '{DEST}' created successfully.")
-    except FileExistsError:
-        #print(f"File '{DEST}' already exists. No new file was created.")
-        pass
-
-    with open(DEST, "w", encoding="utf-8") as f:
-        json.dump(tweets_by_user[username], f, indent=4)
-        #print("JSON wrote successfully")
\ No newline at end of file
+def parse_files(paths: list[str | Path], workers: int | None = None, store=None) -> tuple[int, int]:
+    """Parse files in parallel processes and append new tweets to the post store, returns (parsed, added)"""
+    from app.nlp.post_store import X, get_shared_post_store
+    store = store or get_shared_post_store()
+
+    parsed = added = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, posts in zip(paths, pool.map(parse_file, paths)):
+            parsed += len(posts)
+            added += store.add(X, posts)
+            print(f"{path}: {len(posts)} tweets")
+    return parsed, added
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Parse saved X profile pages into the post store")
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    args = ap.parse_args()
+
+    parsed, added = parse_files(args.files, args.workers)
+    print(f"Finished parsing! Parsed {parsed}; Added {added}; Skipped {parsed - added}")
@@ -3,17 +3,48 @@
 
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import api_router
 from app.core.config import settings
+from app.nlp.registry import registry
+from app.nlp.rag.query_rag import close_shared_store
+from app.nlp.sentiment_batcher import init_shared_batcher, close_shared_batcher
+from app.nlp.sentiment_pool import close_shared_pool
+from app.nlp.stage_runner import init_shared_runner, close_shared_runner
+from app.nlp.post_store import close_shared_post_store
+from app.nlp.price_store import close_shared_price_store
+from app.nlp.result_store import close_shared_result_store
+from app.nlp.truth_social import start_shared_ingester, stop_shared_ingester
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared workers and warm models up in the background, release them on shutdown."""
+    app.state.sentiment_batcher = init_shared_batcher()
+    app.state.stage_runner = init_shared_runner()
+    if settings.MODEL_WARMUP:
+        registry.warm_up()
+    start_shared_ingester()
+    yield
+    stop_shared_ingester()
+    close_shared_runner()
+    close_shared_batcher()
+    close_shared_pool()
+    close_shared_store()
+    close_shared_post_store()
+    close_shared_result_store()
+    close_shared_price_store()
 
 
 app = FastAPI(
     title="Harkonnen Backend API",
     description="Backend API Harkonnen",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add middleware
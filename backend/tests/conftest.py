@@ -0,0 +1,12 @@
+import os
+import sys
+from pathlib import Path
+
+# required settings without a .env, and imports relative to backend/
+os.environ.setdefault("APP_NAME", "Harkonnen")
+os.environ.setdefault("VERSION", "test")
+os.environ.setdefault("API_PREFIX", "/harkonnen")
+os.environ.setdefault("HOST", "127.0.0.1")
+os.environ.setdefault("PORT", "8000")
+os.environ.setdefault("ALLOWED_ORIGINS", '["http://localhost:5173"]')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,43 @@
+import pytest
+
+from app.nlp.alias_matcher import AliasMatcher
+from app.nlp.fuzzy import build_alias_map, read_companies, symbol_aliases
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    rows = read_companies()
+    return AliasMatcher(build_alias_map(rows), symbol_aliases(rows))
+
+
+@pytest.mark.parametrize("text", [
+    "ALL of them voted for it",
+    "We need it NOW",
+    "ICE agents arrested him",
+    "Great meeting with the PM today",
+    "IT is a disaster",
+])
+def test_word_symbols_are_not_bare_tickers(matcher, text):
+    assert matcher.find(text) == set()
+
+
+def test_word_symbols_match_as_cashtags(matcher):
+    assert matcher.find("Bought $ALL, $NOW and $ICE") == {"ALL", "NOW", "ICE"}
+
+
+def test_bare_symbols_still_match(matcher):
+    assert matcher.find("AAPL and NVDA are up") == {"AAPL", "NVDA"}
+
+
+@pytest.mark.parametrize("text, tickers", [
+    ("Meta shares jumped", {"META"}),
+    ("Meta and Alphabet", {"META"}),
+    ("Sold my Etsy and eBay stock", {"ETSY", "EBAY"}),
+    ("Wynn, Ulta and Otis reported", {"WYNN", "ULTA", "OTIS"}),
+])
+def test_tickers_that_are_company_names_match_as_names(matcher, text, tickers):
+    assert tickers <= matcher.find(text)
+
+
+def test_word_symbol_company_names_stay_symbols(matcher):
+    assert matcher.find("Pool party at the Ball") == set()
@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.nlp.alias_matcher import FuzzyAliasIndex
+from app.nlp.fuzzy import build_alias_map, match_tickers_many, read_companies
+
+POSTS = Path(__file__).resolve().parents[1] / "trump_posts_500.json"
+
+# tickers the stored posts used to get from ordinary words ("Energy", "General", "Water", "Healthcare")
+COMMON_WORD_TICKERS = {"ETR", "EVRG", "GNRC", "WAT", "HCA"}
+
+
+@pytest.fixture(scope="module")
+def fuzzy():
+    alias_map = build_alias_map(read_companies())
+    symbols = {alias for alias, ticker in alias_map.items() if alias == ticker.lower()}
+    return FuzzyAliasIndex(alias_map, symbols)
+
+
+@pytest.fixture(scope="module")
+def posts():
+    with open(POSTS) as f:
+        return [post["content"] for post in json.load(f)]
+
+
+@pytest.mark.parametrize("word", ["Energy", "General", "Water", "Healthcare"])
+def test_common_words_are_not_fuzzy_candidates(fuzzy, word):
+    assert fuzzy.phrases(f"{word} is important") == []
+    assert fuzzy.match_many([f"{word} is important"], 83.0) == [{}]
+
+
+def test_stored_posts_get_no_tickers_from_common_words(fuzzy, posts):
+    found = {ticker for result in fuzzy.match_many(posts, 83.0) for ticker in result}
+    assert not found & COMMON_WORD_TICKERS
+
+
+def test_fuzzy_matching_is_off_by_default(posts):
+    assert settings.ENTITY_FUZZY_MATCH is False
+    found = {ticker for result in match_tickers_many(posts) for ticker in result}
+    assert not found & COMMON_WORD_TICKERS
+
+
+@pytest.mark.parametrize("text, ticker", [
+    ("Nvidea earnings beat", "NVDA"),
+    ("Mircosoft cloud", "MSFT"),
+    ("General Motor plant", "GM"),
+])
+def test_misspelled_names_still_match(fuzzy, text, ticker):
+    assert ticker in fuzzy.match_many([text], 83.0)[0]
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.models import PostEntity, PostProcessed, PostSentiment, RawPost, Sentiment
+from app.nlp import nlp
+from app.nlp.result_store import ResultStore
+from app.nlp.stage_runner import StageRunner
+
+OLD = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def raw(i: int, content: str = "up") -> RawPost:
+    return RawPost(post_id=str(i), timestamp=OLD + timedelta(hours=i), username="someone", content=content)
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Sentiment keeps posts saying "up", entities / RAG / finance attach one flat ticker"""
+    seen: list[list[str]] = []
+
+    async def score_posts(raw_posts, batcher):
+        seen.append([p.post_id for p in raw_posts])
+        return [PostSentiment(**p.model_dump(), sentiment=Sentiment(positive=0.9, negative=0.05, neutral=0.05))
+                for p in raw_posts if p.content == "up"]
+
+    def transform_posts(posts):
+        processed = [PostProcessed(**p.model_dump(), price_changes=[]) for p in posts]
+        return processed, 0, 0, len(processed)
+
+    monkeypatch.setattr(nlp, "score_posts", score_posts)
+    monkeypatch.setattr(nlp, "build_all", lambda posts: [PostEntity(**p.model_dump(), tickers=["AAPL"]) for p in posts])
+    monkeypatch.setattr(nlp, "append_rag_results", lambda posts, k, rag: posts)
+    monkeypatch.setattr(nlp, "transform_posts", transform_posts)
+    monkeypatch.setattr(nlp.settings, "PIPELINE_BATCH_SIZE", 4)
+    return seen
+
+
+@pytest.fixture
+def runner():
+    runner = StageRunner(2, 4, {"fetch": 2, "sentiment": 2, "entity": 2, "finance": 2, "store": 2})
+    yield runner
+    runner.close()
+
+
+@pytest.fixture
+def results(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite")
+    yield store
+    store.close()
+
+
+def run(posts, runner, results):
+    async def gather():
+        return [batch async for batch in nlp.materialized("truth_social", "truth_social", "Truth Social", "someone",
+                                                          lambda: iter(posts), runner=runner, batcher=object(), results=results)]
+    return asyncio.run(gather())
+
+
+def test_stored_results_are_not_processed_again(stages, runner, results):
+    posts = [raw(i, "up" if i % 3 else "meh") for i in range(10)]
+    first = run(posts, runner, results)
+    assert sum(len(batch[0]) for batch in first) == 6
+
+    stages.clear()
+    second = run(posts, runner, results)
+    assert stages == []                                 # kept and dropped posts are both final
+    assert [p.post_id for batch in second for p in batch[0]] == [p.post_id for batch in first for p in batch[0]]
+
+
+def test_posts_are_fetched_one_batch_at_a_time(stages, runner, results):
+    fetched: list[str] = []
+    posts = [raw(i) for i in range(40)]
+
+    async def first_batch():
+        def fetch():
+            for post in posts:
+                fetched.append(post.post_id)
+                yield post
+        batches = nlp.materialized("truth_social", "truth_social", "Truth Social", "someone",
+                                   fetch, runner=runner, batcher=object(), results=results)
+        batch = await anext(batches)
+        await batches.aclose()
+        return batch
+
+    batch = asyncio.run(first_batch())
+    assert len(batch[0]) == 4
+    assert len(fetched) < len(posts)
@@ -0,0 +1,203 @@
+import threading
+import time
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.models import PostEntity, Sentiment
+from app.nlp.finance_processing import transform_posts
+from app.nlp.market_data import InMemoryProvider
+from app.nlp.price_store import PriceStore
+
+DAY = pd.Timedelta(days=1)
+FIRST = pd.Timestamp("2023-01-02", tz="UTC")
+
+
+def bars(start: pd.Timestamp, periods: int, freq: str = "1D", seed: int = 0) -> pd.DataFrame:
+    index = pd.date_range(start, periods=periods, freq=freq, tz="UTC")
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, periods).cumsum()
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=index)
+
+
+@pytest.fixture
+def provider():
+    return InMemoryProvider({
+        ("AAA", "1d"): bars(FIRST, 400, seed=1),
+        ("BBB", "1d"): bars(FIRST, 400, seed=2),
+    })
+
+
+def make_store(tmp_path, provider, **kwargs) -> PriceStore:
+    return PriceStore(tmp_path / "prices", provider, **kwargs)
+
+
+def test_only_missing_spans_are_fetched(tmp_path, provider):
+    store = make_store(tmp_path, provider)
+    store.ensure(["AAA"], "1d", FIRST + 10 * DAY, FIRST + 20 * DAY)
+    store.ensure(["AAA"], "1d", FIRST + 5 * DAY, FIRST + 30 * DAY)
+    store.ensure(["AAA"], "1d", FIRST + 5 * DAY, FIRST + 30 * DAY)
+
+    spans = [(start, end) for _, _, start, end in provider.calls]
+    assert spans == [
+        (FIRST + 10 * DAY, FIRST + 20 * DAY),
+        (FIRST + 5 * DAY, FIRST + 10 * DAY),
+        (FIRST + 20 * DAY, FIRST + 30 * DAY),
+    ]
+    stored = store.read("AAA", "1d", FIRST + 5 * DAY, FIRST + 30 * DAY)
+    expected = provider.frames[("AAA", "1d")].loc[FIRST + 5 * DAY:FIRST + 29 * DAY]
+    np.testing.assert_allclose(stored.to_numpy(), expected.to_numpy())
+
+
+def test_tickers_with_the_same_gap_share_a_fetch(tmp_path, provider):
+    store = make_store(tmp_path, provider)
+    store.ensure(["AAA", "BBB"], "1d", FIRST, FIRST + 10 * DAY)
+    assert [tickers for tickers, *_ in provider.calls] == [("AAA", "BBB")]
+
+
+def test_appends_are_compacted(tmp_path, provider):
+    store = make_store(tmp_path, provider)
+    frame = provider.frames[("AAA", "1d")]
+    store._append("AAA", "1d", frame.iloc[10:20], [])
+    store._append("AAA", "1d", frame.iloc[0:15], [])
+    fresh = frame.iloc[5:8] * 2
+    store._append("AAA", "1d", fresh, [])
+
+    stored = store.read("AAA", "1d")
+    assert stored.index.is_monotonic_increasing and stored.index.is_unique
+    assert len(stored) == 20
+    np.testing.assert_allclose(stored.iloc[5:8].to_numpy(), fresh.to_numpy())     # newer bars win
+
+
+def test_empty_answers_are_negative_cached(tmp_path, provider):
+    store = make_store(tmp_path, provider, empty_ttl=60)
+    store.ensure(["ZZZ"], "1d", FIRST, FIRST + 10 * DAY)
+    store.ensure(["ZZZ"], "1d", FIRST, FIRST + 10 * DAY)
+    assert len(provider.calls) == 1
+
+    uncached = make_store(tmp_path / "other", provider)
+    uncached.ensure(["ZZZ"], "1d", FIRST, FIRST + 10 * DAY)
+    uncached.ensure(["ZZZ"], "1d", FIRST, FIRST + 10 * DAY)
+    assert len(provider.calls) == 3
+
+
+def test_provider_errors_are_retried(tmp_path, provider):
+    calls = []
+
+    class Failing:
+        def fetch(self, tickers, interval, start, end):
+            calls.append(tickers)
+            raise RuntimeError("provider down")
+
+    store = make_store(tmp_path, Failing(), empty_ttl=60)
+    store.ensure(["AAA"], "1d", FIRST, FIRST + 10 * DAY)
+    store.ensure(["AAA"], "1d", FIRST, FIRST + 10 * DAY)
+    assert len(calls) == 2
+
+
+def test_fetch_pool_is_shared_between_calls(tmp_path, provider):
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class Slow:
+        def fetch(self, tickers, interval, start, end):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return provider.fetch(tickers, interval, start, end)
+
+    store = make_store(tmp_path, Slow(), max_workers=2)
+    callers = [
+        threading.Thread(target=store.ensure, args=([ticker], "1d", FIRST + i * 10 * DAY, FIRST + (i + 1) * 10 * DAY))
+        for i in range(4) for ticker in ("AAA", "BBB")
+    ]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    store.close()
+    assert peak <= 2
+
+
+def test_reads_never_see_a_half_written_series(tmp_path, provider):
+    store = make_store(tmp_path, provider)
+    frame = bars(FIRST, 20000, freq="1min")
+    errors = []
+    stop = time.monotonic() + 2
+
+    def append():
+        i = 0
+        while time.monotonic() < stop:
+            store._append("AAA", "1m", frame.iloc[:2000 * (i % 10 + 1)], [])
+            i += 1
+
+    def read():
+        while time.monotonic() < stop:
+            try:
+                index, values, _ = store._load("AAA", "1m")
+                assert len(index) == len(values)
+                store.read("AAA", "1m")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=append)] + [threading.Thread(target=read) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def nearest_price(target_time, ticker_data):
+    """The pre-vectorization lookup: first bar at or after target_time"""
+    pos = ticker_data.index.get_indexer([pd.to_datetime(target_time, utc=True)], method="bfill")[0]
+    return None if pos == -1 else float(ticker_data.iloc[pos]["Close"])
+
+
+def test_transform_posts_matches_the_per_post_lookup(tmp_path, provider):
+    rng = np.random.default_rng(7)
+    posts = []
+    for i in range(40):
+        posted = FIRST.to_pydatetime() + timedelta(days=int(rng.integers(1, 390)), hours=int(rng.integers(0, 24)))
+        positive = float(rng.uniform(0, 0.6))
+        posts.append(PostEntity(
+            post_id=str(i), timestamp=posted, username="someone", content="",
+            sentiment=Sentiment(positive=positive, negative=0.6 - positive, neutral=0.4),
+            tickers=list(rng.choice(["AAA", "BBB", "ZZZ"], size=int(rng.integers(1, 3)), replace=False))
+        ))
+
+    processed, one_day_hits, seven_day_hits, ticker_count = transform_posts(posts, make_store(tmp_path, provider))
+
+    expected_one = expected_seven = 0
+    for post, result in zip(posts, processed):
+        dt = post.timestamp.astimezone(timezone.utc)
+        expected = []
+        for ticker in post.tickers:
+            frame = provider.frames.get((ticker, "1d"))
+            if frame is None:
+                continue
+            frame = frame[(frame.index >= dt - pd.Timedelta(days=1)) & (frame.index < dt + pd.Timedelta(days=10))]
+            original = nearest_price(dt, frame)
+            price_24h = nearest_price(dt + pd.Timedelta(hours=24), frame)
+            price_7d = nearest_price(dt + pd.Timedelta(hours=168), frame)
+            if original is None or price_24h is None or price_7d is None:
+                continue
+            direction = 1 if post.sentiment.positive >= 0.3 else -1 if post.sentiment.negative >= 0.3 else 0
+            expected_one += direction * (price_24h - original) > 0
+            expected_seven += direction * (price_7d - original) > 0
+            expected.append((ticker, price_24h - original, price_7d - original, (price_24h - original) / original * 100))
+
+        got = [(c.ticker, c.one_day, c.seven_day, c.one_day_percent) for c in result.price_changes]
+        assert [g[0] for g in got] == [e[0] for e in expected]
+        for g, e in zip(got, expected):
+            np.testing.assert_allclose(g[1:], e[1:])
+
+    assert (one_day_hits, seven_day_hits) == (expected_one, expected_seven)
+    assert ticker_count == sum(len(p.tickers) for p in posts)
@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from app.nlp.rag.query_rag import RagStore
+
+DIM = 8
+
+
+class BlockingModel:
+    """Encodes every text to the same vector, waiting on release while a search is held open"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.entered.set()
+        self.release.wait(5)
+        return np.ones((len(texts), DIM), dtype=np.float32)
+
+
+@pytest.fixture
+def store():
+    index = faiss.IndexFlatIP(DIM)
+    index.add(np.eye(DIM, dtype=np.float32))
+    store = RagStore(model=BlockingModel(), index=index)
+    yield store
+    store.close()
+
+
+def test_retire_waits_for_running_searches(store):
+    store.model.release.clear()
+    results = []
+    search = threading.Thread(target=lambda: results.append(store.search("oil", 3)))
+    search.start()
+    store.model.entered.wait(5)
+
+    store.retire()
+    assert store._conns                                 # still in use by the running search
+
+    store.model.release.set()
+    search.join(5)
+    assert len(results[0]) == 3
+    assert not store._conns
+
+
+def test_retire_closes_an_idle_store_at_once(store):
+    store.search("oil", 3)
+    assert store._conns
+    store.retire()
+    assert not store._conns
+
+    assert len(store.search("oil", 3)) == 3             # late callers still get answers
+    assert not store._conns
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from app.nlp.sentiment import score_cached
+from app.nlp.sentiment_batcher import SentimentBatcher
+from app.nlp.sentiment_cache import SentimentCache
+
+
+class RecordingEngine:
+    """Scores a text by its length, remembers every batch it was asked for"""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+
+    def predict(self, contents: list[str]) -> np.ndarray:
+        self.calls.append(list(contents))
+        return np.array([[len(c), 0, 0] for c in contents], dtype=np.float32)
+
+
+CONTENTS = ["Stocks  up", "Stocks up", " Stocks up\n", "Stocks down"]
+
+
+@pytest.fixture
+def cache():
+    return SentimentCache("test-model", 100)
+
+
+def test_misses_are_scored_once_in_normalized_form(cache):
+    engine = RecordingEngine()
+    probs = score_cached(CONTENTS, lambda: engine, cache)
+    assert engine.calls == [["Stocks up", "Stocks down"]]
+    assert probs[:, 0].tolist() == [9, 9, 9, 11]
+
+    score_cached(CONTENTS, lambda: engine, cache)
+    assert len(engine.calls) == 1
+
+
+def test_batcher_scores_the_same_model_inputs(cache):
+    engine = RecordingEngine()
+    batcher = SentimentBatcher(lambda: engine, wait_ms=50, max_batch_size=len(CONTENTS), cache=cache)
+    try:
+        sentiments = [f.result(5) for f in batcher.submit_many(CONTENTS)]
+    finally:
+        batcher.close()
+    assert engine.calls == [["Stocks up", "Stocks down"]]
+    assert [s.positive for s in sentiments] == [9, 9, 9, 11]
+    np.testing.assert_array_equal(cache.get("Stocks up"), score_cached(["Stocks up"], lambda: engine, cache)[0])
+    assert len(engine.calls) == 1
+
+
+def test_without_a_cache_nothing_is_stored():
+    engine = RecordingEngine()
+    score_cached(CONTENTS, lambda: engine)
+    score_cached(CONTENTS, lambda: engine)
+    assert engine.calls == [["Stocks up", "Stocks down"]] * 2
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.nlp.post_store import TRUTH_SOCIAL, PostStore
+from app.nlp.truth_social import FakeStatusClient, TruthSocialIngester
+
+USER = "someone"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def statuses(first: int, last: int) -> list[dict]:
+    return [
+        {
+            "id": str(i),
+            "created_at": (START + timedelta(minutes=i)).isoformat().replace("+00:00", "Z"),
+            "account": {"username": USER},
+            "content": f"post {i}"
+        }
+        for i in range(first, last + 1)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PostStore(tmp_path / "posts.sqlite")
+    yield store
+    store.close()
+
+
+def test_complete_pull_moves_checkpoint(store):
+    client = FakeStatusClient({USER: statuses(1, 50)}, page_size=10)
+    assert TruthSocialIngester(client, store).ingest(USER) == 50
+    assert store.checkpoint(TRUTH_SOCIAL, USER)[0] == "50"
+
+
+def test_partial_pull_keeps_checkpoint(store):
+    client = FakeStatusClient({USER: statuses(1, 20)}, page_size=10)
+    ingester = TruthSocialIngester(client, store)
+    ingester.ingest(USER)
+
+    client.statuses[USER] = statuses(1, 60)
+    client.fail_after_pages = 2
+    assert ingester.ingest(USER) == 20                  # the pages it did get are kept
+    assert store.checkpoint(TRUTH_SOCIAL, USER)[0] == "20"
+
+    client.fail_after_pages = None
+    assert ingester.ingest(USER) == 20                  # 21..40, the gap left by the failed page
+    assert store.checkpoint(TRUTH_SOCIAL, USER)[0] == "60"
+    assert store.count(TRUTH_SOCIAL) == 60
+
+
+def test_first_pull_is_capped_by_limit(store):
+    client = FakeStatusClient({USER: statuses(1, 100)}, page_size=10)
+    ingester = TruthSocialIngester(client, store)
+    assert ingester.ingest(USER, limit=15) == 15
+    assert [p.post_id for p in store.latest(TRUTH_SOCIAL, USER, 1)] == ["100"]
+    assert store.checkpoint(TRUTH_SOCIAL, USER)[0] == "100"
+
+    client.statuses[USER] = statuses(1, 130)
+    assert ingester.ingest(USER, limit=5) == 30         # later pulls run down to the checkpoint